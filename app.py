@@ -1,43 +1,65 @@
 import streamlit as st
-import pandas as pd
-from datetime import date, timedelta
-import re
-import matplotlib.pyplot as plt
-import io
-import requests 
+import threading
+from datetime import date, datetime
+from uuid import uuid4
+# 🟢 หน้า Login import แค่นี้ (ไม่มี pandas/numpy); engine import หลัง login สำเร็จ
+from oycalc import counter_from_env, instrument
+
+# 🟢 Timing spans (เปิดด้วย OYCALC_TRACE=1 หรือปุ่มในหน้า ?admin; ปิดอยู่ = แทบไม่มี overhead)
+if "_trace" not in st.session_state: st.session_state["_trace"], st.session_state["_trace_id"] = instrument.Recorder(track_run=True), uuid4().hex[:8]
+instrument.bind_session(st.session_state["_trace"])
 
 # ==========================================
 # 1. SECURITY SYSTEM
 # ==========================================
-def check_password():
-    # 🟢 อ่านค่าตัวนับคนล่าสุดมาเตรียมไว้ (เพื่อแสดงที่หน้า Login)
-    try:
-        url_read = "https://api.counterapi.dev/v1/oy_calc_pro_th/visits"
-        response = requests.get(url_read, timeout=2)
-        count = response.json().get("count", 0)
-    except:
-        count = 0
+@st.cache_resource
+def get_visit_counter():
+    # 🟢 อ่าน/นับผ่าน background thread (หน้า Login ไม่ต้องรอ network)
+    return counter_from_env()
+
+@st.cache_resource
+def get_regimen_store():
+    # 🟢 Local snapshot + background refresh (see oycalc/datasource.py for OYCALC_* settings)
+    from oycalc import store_from_env
+    return store_from_env()
+
+@st.cache_resource
+def start_prefetch():
+    # 🟢 โหลด sheet ทั้ง 2 tab + vial tables ล่วงหน้าใน background (ครั้งเดียวต่อ process)
+    store = get_regimen_store()
+    def warm():
+        with instrument.span("prefetch"):
+            from oycalc import get_vial_table
+            for tab in ["Government", "Private"]:
+                try: store.get(tab)
+                except Exception as e: print(f"⚠️ [{tab}] prefetch failed: {e}")
+            get_vial_table('O', [40, 100, 120], 1.0); get_vial_table('Y', [50], 1.0)
+    worker = threading.Thread(target=warm, daemon=True, name="oycalc-prefetch")
+    worker.start()
+    return worker
 
+def check_password():
     def password_entered():
         if st.session_state["password"] == "bms123": 
             st.session_state["password_correct"] = True
+            start_prefetch()
             
             # 🟢 [จุดที่นับ] นับจำนวนคนเฉพาะเมื่อรหัสผ่านถูกต้อง และไม่ใช่ Bot
             is_wake_up_bot = "bot" in st.query_params
             if not is_wake_up_bot:
-                try:
-                    # ยิง API เพื่อบวกเลขเพิ่ม (+1)
-                    requests.get("https://api.counterapi.dev/v1/oy_calc_pro_th/visits/up", timeout=2)
-                    # พิมพ์บอกใน Log หลังบ้าน (Manage App -> Logs)
-                    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"[{now_str}] ✅ Access Granted: Counted 1 Real User.")
-                except:
-                    pass
+                # เข้าคิว +1 (worker จะส่งไป API เป็น batch)
+                with instrument.span("counter.increment"): get_visit_counter().increment()
+                # พิมพ์บอกใน Log หลังบ้าน (Manage App -> Logs)
+                now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                print(f"[{now_str}] ✅ Access Granted: Counted 1 Real User.")
             
             del st.session_state["password"] 
         else:
             st.session_state["password_correct"] = False
 
+    # 🤖 Wake-up bot: อุ่น cache (sheet, vial tables) แต่ไม่นับเป็น visit
+    if "bot" in st.query_params: start_prefetch()
+
     if "password_correct" not in st.session_state:
         # 🎨 ORIGINAL CLEAN UI (แบบดั้งเดิมที่เรียบง่าย)
         st.markdown('<div style="margin-top:15vh; text-align:center;">', unsafe_allow_html=True)
@@ -47,14 +69,19 @@ def check_password():
         if "password_correct" in st.session_state and not st.session_state["password_correct"]:
             st.error("😕 รหัสผ่านไม่ถูกต้อง กรุณาลองใหม่ครับ")
             
-        # แสดงยอดเดิม (ยอดที่นับสำเร็จแล้ว)
-        st.caption(f"Total Successful Access: {count:,}")
+        # แสดงยอดล่าสุดที่มีใน cache (ยังไม่มี = แสดง –)
+        with instrument.span("counter.count"): count = get_visit_counter().count()
+        st.caption(f"Total Successful Access: {count:,}" if count is not None else "Total Successful Access: –")
         
         st.markdown('</div>', unsafe_allow_html=True)
+        instrument.log_run(session=st.session_state["_trace_id"], page="login")
         return False
     return True
 
 if check_password():
+    from oycalc import DISPLAY_AMOUNTS, PRICES, CompareResult, RegimenComparer, SimulationCache, calculate_vials, get_price_index, index_stats, memo_stats
+    from oycalc import build_report, render_pdf, render_png, render_png_matplotlib, render_svg
+
     # ==========================================
     # 2. SETUP & CSS
     # ==========================================
@@ -136,187 +163,44 @@ if check_password():
     # ==========================================
     # 3. CORE LOGIC
     # ==========================================
-    def get_val(val):
-        if pd.isna(val) or str(val).strip() in ['', '-', 'nan']: return 0.0
-        s = str(val).replace(',', '').strip()
-        match = re.search(r"(\d+(\.\d+)?)", s)
-        return float(match.group(1)) if match else 0.0
-
-    # 🟢 Modified to accept 'round_down'
-    def calculate_vials(mg_needed, drug_type, available_stock, multiplier=1.0, round_down=False):
-        if mg_needed <= 0: return 0.0, "-"
-        
-        # 🟢 Rounding Logic
-        target_mg = mg_needed
-        if round_down:
-            target_mg = max(0, mg_needed - 49.9) # Allow -49.9mg deficit
-
-        prices = {'O_40': 23540, 'O_100': 58850, 'O_120': 70620, 'Y_50': 63558}
-        
-        options = []
-        if drug_type == 'O':
-            sizes = sorted([s for s in [40, 100, 120] if s in available_stock], reverse=True)
-            for s in sizes:
-                p = round(prices[f'O_{s}'] * multiplier, 2)
-                options.append((s, p))
-        else: 
-            p = round(prices['Y_50'] * multiplier, 2)
-            options.append((50, p))
-            
-        memo = {}
-        def solve(rem_mg):
-            if rem_mg <= 0: return 0.0, {}, 0
-            if rem_mg in memo: return memo[rem_mg]
-            
-            best_cost = float('inf')
-            best_combo = {}
-            min_vials = float('inf')
-            
-            for size, price in options:
-                res_cost, res_combo, res_vials = solve(rem_mg - size)
-                current_cost = price + res_cost
-                current_vials = 1 + res_vials
-                
-                if current_cost < (best_cost - 0.01):
-                    best_cost = current_cost
-                    min_vials = current_vials
-                    best_combo = res_combo.copy()
-                    best_combo[size] = best_combo.get(size, 0) + 1
-                elif abs(current_cost - best_cost) <= 0.01:
-                    if current_vials < min_vials:
-                        best_cost = current_cost
-                        min_vials = current_vials
-                        best_combo = res_combo.copy()
-                        best_combo[size] = best_combo.get(size, 0) + 1
-            
-            memo[rem_mg] = (best_cost, best_combo, min_vials)
-            return best_cost, best_combo, min_vials
-            
-        cost, combo, _ = solve(target_mg) # Use target_mg
-        details = [f"{s}mg x {count}" for s, count in sorted(combo.items(), reverse=True)]
-        return cost, ", ".join(details)
-
-    # 🟢 Modified to accept 'round_down_mode'
-    def run_simulation(row, weight, stock_o, multiplier, start_dt, skip_wknd, sector, round_down_mode=False):
-        p1_limit = int(get_val(row.get('P1_Cycle_Limit')))
-        p1_o_freq = max(1, int(get_val(row.get('P1_O_Freq_Weeks', 2))))
-        p1_y_freq = max(1, int(get_val(row.get('P1_Y_Freq_Weeks', p1_o_freq))))
-        cap_limit = int(get_val(row.get('PAP_Cap_Months', 10)))
-        has_p2 = pd.notna(row.get('P2_O_Dose')) and str(row.get('P2_O_Dose', '-')).strip() not in ['', '-', '0']
-        
-        timeline, total_paid, curr_date, cycle, weeks = [], 0.0, start_dt, 1, 1 
-        o_admin_total, y_admin_total, y_paid_rounds, o_paid_accum, p1_c, p2_c = 0, 0, 0, 0.0, 0.0, 0.0
-
-        while weeks <= 104:
-            is_p1 = (cycle <= p1_limit)
-            if not is_p1 and not has_p2: break
-            display_date = curr_date
-            if skip_wknd:
-                if display_date.weekday() == 5: display_date += timedelta(days=2)
-                elif display_date.weekday() == 6: display_date += timedelta(days=1)
-            curr_m, freq = ((weeks - 1) // 4) + 1, (p1_o_freq if is_p1 else max(1, int(get_val(row.get('P2_Freq_Weeks')))))
-            
-            o_mg = get_val(str(row.get('P1_O_Dose' if is_p1 else 'P2_O_Dose'))) * (weight if 'mg/kg' in str(row.get('P1_O_Dose' if is_p1 else 'P2_O_Dose')).lower() else 1)
-            y_mg = get_val(str(row.get('P1_Y_Dose', '0'))) * (weight if 'mg/kg' in str(row.get('P1_Y_Dose')).lower() else 1) if (is_p1 and (weeks - 1) % p1_y_freq == 0) else 0.0
-            
-            # 🟢 Apply Rounding to Yervoy
-            o_cost, o_v = calculate_vials(o_mg, 'O', stock_o, multiplier)
-            y_cost, y_v = calculate_vials(y_mg, 'Y', [50], multiplier, round_down=round_down_mode)
-            
-            o_p, y_p, status_msg = 0.0, 0.0, ""
-            
-            if o_mg > 0 and curr_m <= cap_limit:
-                o_admin_total += 1
-                if o_admin_total % 2 != 0:
-                    if (((weeks + freq - 1) // 4) + 1) <= cap_limit:
-                        o_p = o_cost
-                    else:
-                        o_p = o_cost * 0.5
-                        status_msg = " (Pay 50%)"
-                    o_paid_accum += (1.0 if "50%" not in status_msg else 0.5)
-
-            if y_mg > 0 and curr_m <= cap_limit:
-                y_admin_total += 1
-                should_pay_y = (y_admin_total % 2 != 0)
-                
-                # 🏛️ GOVERNMENT RULE
-                if str(sector).lower() == "government" and y_paid_rounds >= 2:
-                    should_pay_y = False
-                
-                if should_pay_y:
-                    if (((weeks + p1_y_freq - 1) // 4) + 1) <= cap_limit:
-                         y_p = y_cost
-                    else:
-                         y_p = y_cost * 0.5
-                    y_paid_rounds += 1
-
-            total_paid += (o_p + y_p)
-            if is_p1 and p1_c == 0 and (o_p + y_p) > 0: p1_c = (o_p + y_p)
-            if not is_p1 and p2_c == 0 and (o_p + y_p) > 0: p2_c = (o_p + y_p)
-            
-            timeline.append({"Phase": f"Phase {1 if is_p1 else 2}", "Cycle": cycle, "RawDate": display_date, "Date": display_date.strftime("%d %b %Y (%a)"),"Month": curr_m, "Opdivo Vials": o_v, "Yervoy Vials": y_v if y_mg > 0 else "-", "Opdivo (฿)": o_p, "Yervoy (฿)": y_p, "Total (฿)": (o_p + y_p), "Status": f"Paid{status_msg}" if (o_p + y_p) > 0 else "Free"})
-            weeks, cycle, curr_date = weeks + freq, cycle + 1, curr_date + timedelta(weeks=freq)
-        
-        return total_paid, o_paid_accum, p1_c, p2_c, pd.DataFrame(timeline), cap_limit, has_p2
+    # Vial solver and PAP simulation live in the oycalc package.
 
     # ==========================================
     # 4. EXPORT FUNCTION
     # ==========================================
-    def generate_image(ind, reg, weight, markup, sector, p1, p2, total, rounds, df, cap_limit):
-        df_display = df[df['Month'] <= (cap_limit + 1)].copy()
-        num_rows = len(df_display) + 1
-        height = 5.0 + (num_rows * 0.5)
-        fig, ax = plt.subplots(figsize=(15, height)) 
-        ax.axis('off')
-        
-        header_text = (
-            f"O+Y Treatment Expense Summary | Sector: {sector}\n"
-            f"----------------------------------------------------------------------------------------------------\n"
-            f"Indication: {ind}\n"
-            f"Regimen:    {reg}\n"
-            f"Weight:     {weight} kg  |  Hospital Markup: {markup}%\n"
-            f"PAP Policy: Capped at {cap_limit} months\n"
-            f"\nCost per Cycle (Phase 1): {p1:,.0f} THB\n"
-            f"Cost per Cycle (Phase 2): {p2:,.0f} THB\n"
-            f"----------------------------------------------------------------------------------------------------\n"
-            f"Summary - Patient Paid Rounds: {rounds:.1f} Cycles (Opdivo)\n"
-            f"Estimated Total Investment:     {total:,.0f} THB\n"
-        )
-        
-        ax.text(0.05, 0.98, header_text, transform=ax.transAxes, fontsize=11, va='top', ha='left', family='monospace', linespacing=1.4)
-        cols = ["Phase", "Cycle", "Date (DD/MM/YY)", "Month", "Opdivo Vials", "Yervoy Vials", "Opdivo (THB)", "Yervoy (THB)", "Total (THB)"]
-        table_data = [cols]
-        for _, r in df_display.iterrows():
-            short_date = r['RawDate'].strftime("%d/%m/%Y")
-            table_data.append([
-                r['Phase'], r['Cycle'], short_date, r['Month'], 
-                r['Opdivo Vials'].replace(', ', '\n'), 
-                r['Yervoy Vials'].replace(', ', '\n'),
-                f"{r['Opdivo (฿)']:,.0f}", f"{r['Yervoy (฿)']:,.0f}", f"{r['Total (฿)']:,.0f}"
-            ])
-        
-        table_height = (num_rows * 0.5) / height
-        the_table = ax.table(cellText=table_data, loc='bottom', bbox=[0.02, 0.05, 0.96, table_height], cellLoc='center')
-        the_table.auto_set_font_size(False); the_table.set_fontsize(10); the_table.scale(1, 2.0) 
-        for (i, j), cell in the_table.get_celld().items():
-            cell.set_edgecolor('#DDDDDD')
-            if i == 0: cell.set_facecolor('#004080'); cell.set_text_props(color='white', weight='bold')
-            else:
-                is_free = "Free" in str(df_display.iloc[i-1]['Status'])
-                if is_free: cell.set_facecolor('#F9F9F9'); cell.set_text_props(color='#888888')
-                else: cell.set_facecolor('white' if i % 2 != 0 else '#F2F5F8')
-        
-        buf = io.BytesIO(); plt.savefig(buf, format='png', bbox_inches='tight', dpi=150); buf.seek(0); plt.close(fig)
-        return buf
+    def generate_image(ind, reg, weight, markup, sector, p1, p2, total, rounds, timeline, cap_limit):
+        # 🟢 วาดด้วย Pillow โดยตรง (เร็วกว่า matplotlib มาก); ไม่มี Pillow ค่อยใช้ matplotlib
+        with instrument.span("export.image", memory=True):
+            report = build_report(ind, reg, weight, markup, sector, p1, p2, total, rounds, timeline, cap_limit)
+            try:
+                return report, render_png(report)
+            except ImportError:
+                return report, render_png_matplotlib(report)
 
     # ==========================================
     # 5. RENDER UI
     # ==========================================
-    @st.cache_data
     def load_data(tab_name):
-        sheet_id = "1YXD44pN5mLwazxOiXCHHcylvB082jdtNivXX4VpXdJM"
-        url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={tab_name}"
-        return pd.read_csv(url)
+        with instrument.span("load_data"): data = get_regimen_store().get(tab_name)
+        return data.df, data.specs, data.issues
+
+    @st.cache_resource
+    def get_sim_cache():
+        # 🟢 What-if cache: markup only reprices, dates only redo the date columns
+        cache = SimulationCache()
+        instrument.register_gauge("sim_cache", cache.stats)
+        instrument.register_gauge("vials", memo_stats)
+        instrument.register_gauge("price_bands", index_stats)
+        return cache
+
+    # 🟢 Timeline แบบ columnar: ตาราง / PNG / LINE ใช้ข้อความที่ format ไว้แล้วชุดเดียวกัน
+    simulate_timeline = get_sim_cache().timeline
+
+    @st.cache_resource
+    def get_comparer():
+        comparer = RegimenComparer()
+        instrument.register_gauge("comparer", comparer.stats)
+        return comparer
 
     with st.sidebar:
         st.markdown('<div class="app-branding"><div class="app-title-luxury">O+Y Calculator</div><div class="app-subtitle-luxury">Precision PAP Support</div></div>', unsafe_allow_html=True)
@@ -340,14 +224,14 @@ if check_password():
         except ImportError:
             sector = st.radio("Select Sector", ["Government", "Private"], horizontal=True)
         
-        df = load_data(sector)
+        df, specs, sheet_issues = load_data(sector)
         weight = st.number_input("Patient Weight (kg)", 1.0, 150.0, 60.0, step=0.5)
         ind = st.selectbox("Select Indication", df['Indication_Group'].dropna().unique())
         subset = df[df['Indication_Group'] == ind]
         reg = st.radio("Protocol", subset['Regimen_Name'])
         markup = st.slider("Hospital Markup (%)", 0, 100, 0)
         
-        base_price = 58850
+        base_price = PRICES['O_100']
         marked_price = base_price * (1 + markup/100)
         st.caption(f"💡 Ref (O_100): ฿{base_price:,.0f} ➡️ **฿{marked_price:,.0f}**")
         
@@ -356,6 +240,7 @@ if check_password():
             start_dt = st.date_input("First Dose Date", date.today())
             skip_wk = st.checkbox("Skip Weekend Appointments", value=True)
             stock = st.multiselect("Vials in Stock", [40, 100, 120], default=[40, 100, 120])
+            if not stock: st.warning("⚠️ Select at least one Opdivo vial size to calculate a price.")
             
             # 🟢 Added Vial Rounding Option
             st.markdown("---")
@@ -367,9 +252,13 @@ if check_password():
 
         if st.button("🚪 Logout"): del st.session_state["password_correct"]; st.rerun()
 
+    # 🟢 ไม่มีขวดยาในสต็อก = ราคาเป็น inf, หยุดก่อนคำนวณ
+    if not stock: st.stop()
+
     # 🟢 Pass is_round_down
-    sel_row = subset[subset['Regimen_Name'] == reg].iloc[0]
-    total_val, o_rounds, p1_c, p2_c, df_res, cap_val, has_p2_flag = run_simulation(sel_row, weight, stock, (1 + markup/100), start_dt, skip_wk, sector, is_round_down)
+    sel_spec = specs[subset[subset['Regimen_Name'] == reg].index[0]]
+    with instrument.span("simulate.main"):
+        total_val, o_rounds, p1_c, p2_c, timeline, cap_val, has_p2_flag = simulate_timeline(sel_spec, weight, stock, (1 + markup/100), start_dt, skip_wk, sector, is_round_down)
 
     st.markdown(f'<div class="ind-title">{ind}</div><div class="protocol-sub">Regimen: {reg} | Sector: {sector}</div>', unsafe_allow_html=True)
     phase_html = f'<div class="card-wrapper"><div class="phase-card p1"><div class="card-label">Phase 1 / Cycle</div><div class="card-value">฿ {p1_c:,.0f}</div><div class="card-vat">● Inclusive of 7% VAT</div></div>'
@@ -379,42 +268,80 @@ if check_password():
 
     other_regimens = subset[subset['Regimen_Name'] != reg]
     if not other_regimens.empty:
-        with st.expander(f"⚖️ Compare with other {ind} protocols", expanded=False):
-            st.markdown(f"**Comparing with current selection ({reg}):**")
-            for _, other_row in other_regimens.iterrows():
-                other_name = other_row['Regimen_Name']
-                # 🟢 Pass is_round_down to comparison
-                other_res = run_simulation(other_row, weight, stock, (1 + markup/100), start_dt, skip_wk, sector, is_round_down)
-                other_total = other_res[0]
-                diff = other_total - total_val
-                diff_text = f"+฿ {diff:,.0f}" if diff > 0 else f"-฿ {abs(diff):,.0f}"
-                diff_color = "diff-neg" if diff > 0 else "diff-pos"
-                icon = "🔺" if diff > 0 else "🔻"
-                st.markdown(f"""<div class="comp-container"><div><div class="comp-title">{other_name}</div><div class="comp-diff {diff_color}">{icon} {diff_text} vs current</div></div><div class="comp-val">฿ {other_total:,.0f}</div></div>""", unsafe_allow_html=True)
+        # 🟢 คำนวณเฉพาะตอนเปิด expander (on_change="rerun" ให้ .open บอกสถานะ)
+        compare_box = st.expander(f"⚖️ Compare with other {ind} protocols", expanded=False, key="compare_open", on_change="rerun")
+        with compare_box:
+            if compare_box.open:
+                other_specs = [specs[i] for i in other_regimens.index]
+                # 🟢 Pass is_round_down to comparison (process pool + memo)
+                with instrument.span("simulate.compare"):
+                    other_results = get_comparer().compare(other_specs, weight, stock, (1 + markup/100), start_dt, skip_wk, sector, is_round_down)
+                st.markdown(f"**Comparing with current selection ({reg}):**")
+                for other_res in other_results:
+                    other_name, other_total = other_res.name, other_res.total
+                    diff = other_total - total_val
+                    diff_text = f"+฿ {diff:,.0f}" if diff > 0 else f"-฿ {abs(diff):,.0f}"
+                    diff_color = "diff-neg" if diff > 0 else "diff-pos"
+                    icon = "🔺" if diff > 0 else "🔻"
+                    st.markdown(f"""<div class="comp-container"><div><div class="comp-title">{other_name}</div><div class="comp-diff {diff_color}">{icon} {diff_text} vs current</div></div><div class="comp-val">฿ {other_total:,.0f}</div></div>""", unsafe_allow_html=True)
+
+                # 📊 Ranked table (รวม regimen ปัจจุบัน)
+                ranked = sorted([CompareResult(reg, total_val, o_rounds, p1_c, p2_c)] + other_results, key=lambda r: r.total)
+                st.dataframe([{"Rank": i + 1, "Regimen": r.name + (" ✅" if r.name == reg else ""), "Total (฿)": f"{r.total:,.0f}", "Paid Rounds": f"{r.o_rounds:.1f}",
+                               "P1 / Cycle (฿)": f"{r.p1_cost:,.0f}", "P2 / Cycle (฿)": f"{r.p2_cost:,.0f}"} for i, r in enumerate(ranked)],
+                             use_container_width=True, hide_index=True)
+
+    # 📈 ราคาเป็นขั้นบันไดตามน้ำหนัก (เปลี่ยนเฉพาะตอนชุด vial เปลี่ยน) - ค้นจาก index ไม่ต้อง simulate ใหม่
+    band_box = st.expander("📈 Price bands by weight", expanded=False, key="bands_open", on_change="rerun")
+    with band_box:
+        if band_box.open:
+            w_lo, w_hi = st.slider("Weight range (kg)", 1.0, 150.0, (max(1.0, weight - 10), min(150.0, weight + 10)), step=0.5)
+            with instrument.span("bands.lookup"):
+                price_index = get_price_index(sel_spec, stock, (1 + markup/100), sector, is_round_down)
+                bands, current_band = price_index.between(w_lo, w_hi), price_index.band(weight)
+            points = [{"Weight (kg)": max(b.lo, w_lo), "Total (฿)": b.totals.total} for b in bands]
+            points.append({"Weight (kg)": w_hi, "Total (฿)": bands[-1].totals.total})
+            st.vega_lite_chart({"data": {"values": points}, "mark": {"type": "line", "interpolate": "step-after", "point": True},
+                                "encoding": {"x": {"field": "Weight (kg)", "type": "quantitative", "scale": {"zero": False}},
+                                             "y": {"field": "Total (฿)", "type": "quantitative", "scale": {"zero": False}}}},
+                               use_container_width=True)
+            # 🟢 band เริ่มที่ 1 ulp เหนือ breakpoint: แสดงเป็น "> lo – hi" (lo ไม่รวม), band ที่เหลือแค่น้ำหนักเดียวแสดงเลขเดียว
+            def band_label(b):
+                lo, hi = f"{max(b.lo, w_lo):.2f}", f"{min(b.hi, w_hi):.2f}"
+                if lo == hi: return lo
+                return (f"> {lo}" if b.lo > w_lo else lo) + f" – {hi}"
+            st.dataframe([{"Weight (kg)": band_label(b) + (" ✅" if b is current_band else ""),
+                           "Total (฿)": f"{b.totals.total:,.0f}", "P1 / Cycle (฿)": f"{b.totals.p1_cost:,.0f}", "P2 / Cycle (฿)": f"{b.totals.p2_cost:,.0f}",
+                           "Opdivo P1": b.p1_o_vials, "Opdivo P2": b.p2_o_vials if has_p2_flag else "-", "Yervoy": b.y_vials} for b in bands],
+                         use_container_width=True, hide_index=True)
 
     st.markdown(f'<div class="grand-box"><div style="display: flex; justify-content: space-between; align-items: flex-end;"><div><div class="metric-sub">Total Patient Pay</div><div class="metric-main">฿ {total_val:,.0f}</div><div class="grand-vat">● Includes 7% VAT and {markup}% Hospital Markup</div></div><div style="text-align: right;"><div class="metric-sub">Paid Rounds (Opdivo)</div><div class="metric-main">{o_rounds:.1f} Cycles</div></div></div></div>', unsafe_allow_html=True)
     st.markdown(f'<div class="policy-box"><b>PAP Policy:</b> Payment capped at <b>{cap_val} months</b>. Medication beyond the cap is free until PD or max 2 years.</div>', unsafe_allow_html=True)
-    st.dataframe(df_res.drop(columns=['RawDate']).style.format({"Opdivo (฿)": "{:,.0f}", "Yervoy (฿)": "{:,.0f}", "Total (฿)": "{:,.0f}"}), use_container_width=True, height=500, hide_index=True)
+    with instrument.span("render.timeline_table"):
+        st.dataframe(timeline.display, use_container_width=True, height=500, hide_index=True,
+                     column_config={c: st.column_config.NumberColumn(format="%,.0f") for c in DISPLAY_AMOUNTS})
 
     st.markdown("---")
     if st.button("📸 Generate Summary Image"):
         with st.spinner("Generating Image..."):
-            img_buf = generate_image(ind, reg, weight, markup, sector, p1_c, p2_c, total_val, o_rounds, df_res, cap_val)
-            st.download_button(label="⬇️ Download PNG Report", data=img_buf, file_name=f"OY_Plan_{sector}_{ind}.png", mime="image/png")
+            report, img_buf = generate_image(ind, reg, weight, markup, sector, p1_c, p2_c, total_val, o_rounds, timeline, cap_val)
+            dl1, dl2, dl3 = st.columns(3)
+            dl1.download_button(label="⬇️ Download PNG Report", data=img_buf, file_name=f"OY_Plan_{sector}_{ind}.png", mime="image/png")
+            dl2.download_button(label="⬇️ PDF (multi-page)", data=render_pdf(report), file_name=f"OY_Plan_{sector}_{ind}.pdf", mime="application/pdf")
+            dl3.download_button(label="⬇️ SVG", data=render_svg(report), file_name=f"OY_Plan_{sector}_{ind}.svg", mime="image/svg+xml")
 
     st.markdown("---")
     with st.expander("💬 กดเพื่อดูข้อความสำหรับส่ง LINE", expanded=False):
-        p1_o_dose_raw = str(sel_row.get('P1_O_Dose'))
-        p1_o_mg = get_val(p1_o_dose_raw) * (weight if 'mg/kg' in p1_o_dose_raw.lower() else 1)
-        _, p1_o_vials_txt = calculate_vials(p1_o_mg, 'O', stock, (1 + markup/100))
-        
-        p1_y_dose_raw = str(sel_row.get('P1_Y_Dose', '0'))
-        p1_y_mg = get_val(p1_y_dose_raw) * (weight if 'mg/kg' in p1_y_dose_raw.lower() else 1)
-        
-        # 🟢 Pass is_round_down to text generation
-        _, p1_y_vials_txt = calculate_vials(p1_y_mg, 'Y', [50], (1 + markup/100), round_down=is_round_down)
+        p1_o_mg = sel_spec.p1_o.mg(weight)
+        p1_y_mg = sel_spec.p1_y.mg(weight)
+        p1_vials = timeline.phase1_vials()
+        if p1_vials: p1_o_vials_txt, p1_y_vials_txt = p1_vials
+        else:
+            _, p1_o_vials_txt = calculate_vials(p1_o_mg, 'O', stock, (1 + markup/100))
+            # 🟢 Pass is_round_down to text generation
+            _, p1_y_vials_txt = calculate_vials(p1_y_mg, 'Y', [50], (1 + markup/100), round_down=is_round_down)
         
-        freq_weeks = max(1, int(get_val(sel_row.get('P1_O_Freq_Weeks', 2))))
+        freq_weeks = sel_spec.p1_o_freq
         
         copy_text = f"""สรุปแผนการรักษา (O+Y PAP) สำหรับคนไข้ {ind} 
 
@@ -446,3 +373,26 @@ Protocol: {reg}
 
 
 
+
+
+    # ==========================================
+    # 6. ADMIN TIMING PANEL (เปิดด้วย ?admin)
+    # ==========================================
+    if "admin" in st.query_params:
+        with st.expander("🩺 Timing & Caches (admin)", expanded=False):
+            tracing = st.toggle("Record timings", value=instrument.enabled(), help="Same as OYCALC_TRACE=1, for this server process")
+            if tracing != instrument.enabled(): instrument.enable(tracing); st.rerun()
+            def pct_table(rec):
+                return [{"Span": name, "N": v['n'], "p50": f"{v['p50']:,.1f}", "p90": f"{v['p90']:,.1f}", "p99": f"{v['p99']:,.1f}", "Max": f"{v['max']:,.1f}",
+                         "Unit": "MB" if name.endswith(".peak_mb") else "ms"} for name, v in rec.summary().items()]
+            st.markdown(f"**This session** (`{st.session_state['_trace_id']}`)")
+            st.dataframe(pct_table(st.session_state["_trace"]), use_container_width=True, hide_index=True)
+            st.markdown("**This process**")
+            st.dataframe(pct_table(instrument.PROCESS), use_container_width=True, hide_index=True)
+            st.json(instrument.gauges(), expanded=False)
+            # 🟢 cell ที่อ่านไม่ได้ (นับเป็น 0) - log ไว้ตอนโหลด sheet แล้ว, แสดงเฉพาะ admin
+            if sheet_issues:
+                st.markdown(f"**{sector} sheet: {len(sheet_issues)} unreadable cell(s) treated as 0**")
+                st.code("\n".join(map(str, sheet_issues)), language="text")
+
+    instrument.log_run(session=st.session_state["_trace_id"], page="calc", sector=sector, regimen=reg)
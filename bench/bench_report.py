@@ -0,0 +1,53 @@
+"""Pillow report renderer vs the original matplotlib table.
+
+    python bench/bench_report.py [--repeat 5]
+
+Renders a short (cap-limited Phase 1) and a long (Phase 2 to week 104, cap 24)
+timeline with each backend and prints median wall time and peak traced memory.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from oycalc import Dose, RegimenSpec, SimulationCache  # noqa: E402
+from oycalc.report import build_report, render_pdf, render_png, render_png_matplotlib, render_svg  # noqa: E402
+
+CASES = {
+    "short": RegimenSpec("NSCLC", "O 360mg q3w + Y 1mg/kg q6w", Dose(360, False), 3, Dose(1, True), 6, 35,
+                         Dose(0, False), 1, 10, False),
+    "long": RegimenSpec("Melanoma", "O 1mg/kg + Y 3mg/kg x4 -> O 3mg/kg q2w", Dose(1, True), 3, Dose(3, True), 3, 4,
+                        Dose(3, True), 2, 24, True),
+}
+RENDERERS = {"pillow-png": render_png, "svg": render_svg, "pdf": render_pdf, "matplotlib-png": render_png_matplotlib}
+
+
+def measure(fn, report, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(report); times.append(time.perf_counter() - t)
+    tracemalloc.start(); fn(report); peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    for case, spec in CASES.items():
+        total, rounds, p1, p2, timeline, cap, _ = SimulationCache().timeline(spec, 72.5, [40, 100, 120], 1.2, date(2026, 1, 5),
+                                                                             True, "Private")
+        report = build_report(spec.indication, spec.name, 72.5, 20, "Private", p1, p2, total, rounds, timeline, cap)
+        for name, fn in RENDERERS.items():
+            fn(report)  # warm fonts / imports
+            t, peak = measure(fn, report, args.repeat)
+            print(f"{case:6s} {len(report.rows):3d} rows  {name:15s} {t * 1000:8.1f} ms  peak {peak / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Import-time budget for cold starts.
+
+    python bench/import_budget.py              # check against bench/import_budget.json
+    python bench/import_budget.py --update     # re-record (keeps the forbidden lists)
+
+Each stage is timed in a fresh interpreter (best of ``--repeat``) so nothing
+is already in ``sys.modules``.  A stage fails when it
+
+* loads a module on its ``forbidden`` list - the login page must not pull in
+  pandas / NumPy / matplotlib / requests; this part does not depend on the
+  machine, or
+* takes longer than ``budget_ms`` x ``--tolerance`` (default 1.5).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+BUDGET = os.path.join(HERE, "import_budget.json")
+
+HEAVY = ["pandas", "numpy", "matplotlib", "requests", "pyarrow", "PIL"]
+STAGES = {
+    # what app.py runs before the login form renders
+    "login": ("import streamlit\nfrom oycalc import counter_from_env, instrument", HEAVY),
+    # first page after login: the pricing engine
+    "engine": ("from oycalc import PRICES, CompareResult, RegimenComparer, SimulationCache, calculate_vials", ["matplotlib", "PIL"]),
+    # "Generate Summary Image" with the Pillow renderer
+    "report": ("from oycalc import build_report, render_png\nimport PIL.Image, PIL.ImageDraw, PIL.ImageFont", ["matplotlib"]),
+}
+
+_PROBE = """
+import sys, time
+t = time.perf_counter()
+exec(compile({code!r}, "<stage>", "exec"))
+ms = (time.perf_counter() - t) * 1000
+print(ms, *[m for m in {forbidden!r} if m in sys.modules])
+"""
+
+
+def measure(code, forbidden, repeat):
+    best, loaded = None, []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(code=code, forbidden=forbidden)], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.split()
+        ms, loaded = float(out[0]), out[1:]
+        best = ms if best is None else min(best, ms)
+    return best, loaded
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--budget", default=BUDGET)
+    ap.add_argument("--update", action="store_true")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--tolerance", type=float, default=1.5)
+    args = ap.parse_args(argv)
+
+    results, failures = {}, []
+    for name, (code, forbidden) in STAGES.items():
+        ms, loaded = measure(code, forbidden, args.repeat)
+        results[name] = round(ms, 1)
+        print(f"{name:8s} {ms:8.1f} ms" + (f"   loads {', '.join(loaded)}" if loaded else ""))
+        if loaded:
+            failures.append(f"{name}: imports {', '.join(loaded)}")
+
+    if args.update:
+        with open(args.budget, "w") as f:
+            json.dump({"budget_ms": results, "python": sys.version.split()[0]}, f, indent=1, sort_keys=True)
+        print(f"✅ budget written -> {args.budget}")
+    else:
+        with open(args.budget) as f:
+            budget = json.load(f)["budget_ms"]
+        for name, ms in results.items():
+            if name in budget and ms > budget[name] * args.tolerance:
+                failures.append(f"{name}: {ms:.0f} ms > {budget[name]:.0f} ms x {args.tolerance}")
+    for msg in failures:
+        print(f"❌ {msg}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Offline load test for the quotation service (``python -m oycalc serve``).
+
+    python bench/loadtest.py                                  # starts a server on the bench fixtures
+    python bench/loadtest.py --connections 64 --duration 20 --workers 4
+    python bench/loadtest.py --url http://127.0.0.1:8765      # a server that is already running
+
+Each connection sends requests back to back over one keep-alive socket:
+single quotes, plus ``--batch-share`` batches of ``--batch-size`` quotes,
+for random fixture regimens, weights, markups and stocks.  ``--repeat-share``
+of the requests re-send a recent body, so in-flight coalescing is exercised.
+A ``503`` is counted and its ``Retry-After`` honoured.
+
+Prints client-side throughput and latency percentiles per request kind, the
+status counts, and the server's own ``/stats``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from oycalc import FileSource, RegimenStore, instrument  # noqa: E402
+
+FIXTURES = os.path.join(HERE, "fixtures")
+SECTORS = ("Government", "Private")
+STOCKS = ([40, 100, 120], [100, 120], [40])
+
+
+def regimen_names():
+    store = RegimenStore(FileSource(FIXTURES), cache_dir=None)
+    out = []
+    for sector in SECTORS:
+        data = store.get(sector)
+        for i, spec in data.specs.items():
+            out.append((sector, str(data.df.at[i, 'Indication_Group']).strip(), spec.name.strip()))
+    return out
+
+
+def random_quote(rnd, names, timeline_share):
+    sector, indication, regimen = rnd.choice(names)
+    quote = {"sector": sector, "indication": indication, "regimen": regimen,
+             "weight": rnd.randrange(80, 200) / 2, "markup": rnd.choice([0, 10, 15, 20]),
+             "stock": rnd.choice(STOCKS), "start_date": "2026-01-05", "round_down": rnd.random() < 0.2}
+    if rnd.random() < timeline_share:
+        quote["timeline"] = True
+    return quote
+
+
+async def request(reader, writer, host, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    payload = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers, payload
+
+
+async def connection(host, port, deadline, args, names, seed, latency, statuses):
+    rnd = random.Random(seed)
+    recent = []
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            if recent and rnd.random() < args.repeat_share:
+                kind, path, body = rnd.choice(recent)
+            elif rnd.random() < args.batch_share:
+                kind, path = "batch", "/quote/batch"
+                body = {"quotes": [random_quote(rnd, names, 0) for _ in range(args.batch_size)]}
+            else:
+                kind, path, body = "single", "/quote", random_quote(rnd, names, args.timeline_share)
+            recent = (recent + [(kind, path, body)])[-20:]
+            t0 = time.perf_counter()
+            status, headers, _ = await request(reader, writer, host, "POST", path, body)
+            latency.add(kind, (time.perf_counter() - t0) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            latency.incr("quotes", len(body["quotes"]) if kind == "batch" and status == 200 else int(status == 200))
+            if status == 503:
+                await asyncio.sleep(float(headers.get("retry-after", 1)))
+    finally:
+        writer.close()
+
+
+async def run(host, port, args):
+    names = regimen_names()
+    latency, statuses = instrument.Recorder(window=10 ** 7), {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*[connection(host, port, deadline, args, names, args.seed + i, latency, statuses)
+                           for i in range(args.connections)])
+    elapsed = time.perf_counter() - started
+    reader, writer = await asyncio.open_connection(host, port)
+    _, _, stats = await request(reader, writer, host, "GET", "/stats")
+    writer.close()
+    return elapsed, latency, statuses, json.loads(stats)
+
+
+def start_server(args):
+    env = dict(os.environ, OYCALC_DATA_DIR=FIXTURES, OYCALC_CACHE_DIR="")
+    cmd = [sys.executable, "-m", "oycalc", "serve", "--port", "0", "--max-queue", str(args.max_queue)]
+    if args.workers is not None:
+        cmd += ["--workers", str(args.workers)]
+    proc = subprocess.Popen(cmd, cwd=os.path.join(HERE, ".."), env=env, stderr=subprocess.PIPE, text=True)
+    for line in proc.stderr:
+        if "serving quotes on" in line:
+            print(line.strip())
+            return proc, urlsplit(re.search(r"http://\S+", line).group())
+    raise RuntimeError(f"server exited with {proc.wait()}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="service to test (default: start one on the bench fixtures)")
+    ap.add_argument("--connections", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds")
+    ap.add_argument("--batch-share", type=float, default=0.1)
+    ap.add_argument("--batch-size", type=int, default=50)
+    ap.add_argument("--repeat-share", type=float, default=0.3)
+    ap.add_argument("--timeline-share", type=float, default=0.05)
+    ap.add_argument("--workers", type=int, default=None, help="workers of the started server")
+    ap.add_argument("--max-queue", type=int, default=4096, help="queue limit of the started server")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    proc = None
+    if args.url:
+        url = urlsplit(args.url)
+    else:
+        proc, url = start_server(args)
+    try:
+        elapsed, latency, statuses, server = asyncio.run(run(url.hostname, url.port, args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    counts = latency.counters()
+    requests = sum(statuses.values())
+    print(f"{requests:,} requests, {counts.get('quotes', 0):,} quotes in {elapsed:.1f}s over {args.connections} connections: "
+          f"{requests / elapsed:,.0f} req/s, {counts.get('quotes', 0) / elapsed:,.0f} quotes/s")
+    print("status " + "  ".join(f"{k}: {v:,}" for k, v in sorted(statuses.items())))
+    for kind, s in latency.summary().items():
+        print(f"{kind:8s} n={s['n']:<7,} p50 {s['p50']:7.2f}  p90 {s['p90']:7.2f}  p99 {s['p99']:7.2f}  max {s['max']:8.2f} ms")
+    print("server " + json.dumps({k: server[k] for k in ("counters", "requests_per_s", "quotes_per_s", "queued", "workers")}))
+    return 0 if set(statuses) <= {200, 503} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Benchmark + regression suite for the pricing hot paths.
+
+    python bench/regression.py                  # compare against bench/baseline.json
+    python bench/regression.py --update         # re-record the baseline
+    python bench/regression.py --max-slowdown 1.3 --repeat 7
+
+Runs offline against ``bench/fixtures/<tab>.csv``.  The fixtures are a
+synthetic stand-in for the Government / Private tabs (same columns and cell
+formats as the sheet - "360 mg", "3 mg/kg", "-" / blank / "0" for no Phase 2 -
+plus a few edge rows); re-export the real tabs over them when the sheet is
+reachable and run ``--update``.
+
+Two checks, either one fails the run (exit 1):
+
+* totals - every (sector, regimen, weight, markup, stock, round mode) on the
+  grid, rounded to the baht, must equal the baseline; ``SimulationCache``,
+  ``simulate_batch``, ``simulate_totals``, ``PriceIndex`` and
+  ``RegimenComparer`` must agree with ``run_simulation``,
+* timings - the median of each benchmark may be at most ``--max-slowdown``
+  times its baseline (default 1.5, or ``OYCALC_BENCH_SLOWDOWN``).  Timings
+  are machine dependent: record the baseline on the machine that checks it.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from oycalc import (FileSource, RegimenComparer, RegimenStore, SimulationCache,  # noqa: E402
+                    build_report, calculate_vials, get_price_index, run_simulation, simulate_batch, simulate_totals)
+from oycalc import vials as vials_module  # noqa: E402
+from oycalc.bands import PriceIndex  # noqa: E402
+from oycalc.report import render_png  # noqa: E402
+
+FIXTURES = os.path.join(HERE, "fixtures")
+BASELINE = os.path.join(HERE, "baseline.json")
+SECTORS = ("Government", "Private")
+START = date(2026, 1, 5)            # a Monday, so skip-weekend shifts are exercised by q3w/q6w
+WEIGHTS = (35, 48.5, 60, 72.5, 88, 110, 150)
+MARKUPS = (0, 15, 30, 100)
+STOCKS = ((40, 100, 120), (100, 120), (40,))
+
+
+def load_fixtures():
+    store = RegimenStore(FileSource(FIXTURES), cache_dir=None)
+    return {sector: store.get(sector) for sector in SECTORS}
+
+
+# ---------- totals ----------
+def _key(sector, ind, name, weight, markup, stock, round_down):
+    return f"{sector}|{ind}|{name}|{weight:g}|{markup:g}|{'/'.join(map(str, stock))}|{'down' if round_down else 'up'}"
+
+
+def golden_totals(data):
+    """Baht-rounded total for every grid point, from ``run_simulation``."""
+    out = {}
+    for sector, d in data.items():
+        for spec, weight, markup, stock, rd in itertools.product(d.specs, WEIGHTS, MARKUPS, STOCKS, (False, True)):
+            total = run_simulation(spec, weight, stock, 1 + markup / 100, START, True, sector, rd)[0]
+            out[_key(sector, spec.indication, spec.name, weight, markup, stock, rd)] = round(total)
+    return out
+
+
+def cross_check(data, golden):
+    """Keys where the other engines disagree with ``run_simulation`` at baht level."""
+    bad = []
+    cache = SimulationCache(maxsize=4096)
+    comparer = RegimenComparer(max_workers=1, min_parallel=10 ** 9)   # serial: same code path, no pool start-up
+    for sector, d in data.items():
+        for stock, rd in itertools.product(STOCKS, (False, True)):
+            grid = simulate_batch(d.df, WEIGHTS, MARKUPS, stock, sector, rd, specs=d.specs)
+            for rec in grid.to_dict("records"):
+                key = _key(sector, rec['Indication_Group'], rec['Regimen_Name'], rec['weight'], rec['markup'], stock, rd)
+                if round(rec['total_paid']) != golden[key]:
+                    bad.append(f"simulate_batch {key}")
+            for weight, markup in itertools.product(WEIGHTS, MARKUPS):
+                multiplier = 1 + markup / 100
+                results = comparer.compare(list(d.specs), weight, stock, multiplier, START, True, sector, rd)
+                for spec, res in zip(d.specs, results):
+                    key = _key(sector, spec.indication, spec.name, weight, markup, stock, rd)
+                    if round(res.total) != golden[key]:
+                        bad.append(f"RegimenComparer {key}")
+                    if round(cache.run(spec, weight, stock, multiplier, START, True, sector, rd)[0]) != golden[key]:
+                        bad.append(f"SimulationCache {key}")
+                    if round(simulate_totals(spec, weight, stock, multiplier, sector, rd).total) != golden[key]:
+                        bad.append(f"simulate_totals {key}")
+                    if round(cache.timeline(spec, weight, stock, multiplier, START, True, sector, rd)[0]) != golden[key]:
+                        bad.append(f"SimulationCache.timeline {key}")
+                    if round(get_price_index(spec, stock, multiplier, sector, rd).totals(weight).total) != golden[key]:
+                        bad.append(f"PriceIndex {key}")
+    return bad
+
+
+# ---------- benchmarks ----------
+def _median(fn, repeat, setup=None, number=1):
+    """Median seconds per call; each sample times ``number`` calls, so sub-millisecond paths are not all noise."""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        t = time.perf_counter()
+        for _ in range(number): fn()
+        times.append((time.perf_counter() - t) / number)
+    return statistics.median(times)
+
+
+def benchmarks(data, repeat):
+    """{name: median seconds}.  Cold runs clear the shared vial tables first."""
+    cold = vials_module._table.cache_clear
+    doses = [mg / 4 for mg in range(1, 1500 * 4 + 1, 7)]        # 0.25 .. 1500 mg, fractional doses included
+
+    def vials_sweep():
+        for mg in doses:
+            for stock in STOCKS:
+                calculate_vials(mg, 'O', stock, 1.15)
+            calculate_vials(mg, 'Y', [50], 1.15, round_down=mg > 100)
+
+    def simulate_all():
+        for sector, d in data.items():
+            for spec in d.specs:
+                run_simulation(spec, 72.5, STOCKS[0], 1.15, START, True, sector)
+
+    def summarize_all():
+        for sector, d in data.items():
+            for spec in d.specs:
+                simulate_totals(spec, 72.5, STOCKS[0], 1.15, sector)
+
+    def bands_all():
+        for sector, d in data.items():
+            for spec in d.specs:
+                PriceIndex(spec, STOCKS[0], 1.15, sector)
+
+    comparer = RegimenComparer(max_workers=1, min_parallel=10 ** 9)
+    gov = data["Government"]
+
+    def compare_all():
+        comparer._memo.clear()
+        comparer.compare(list(gov.specs), 72.5, STOCKS[0], 1.15, START, True, "Government")
+
+    long_spec = max(data["Private"].specs, key=lambda s: (s.cap_months, s.has_p2))
+    total, rounds, p1, p2, timeline, cap, _ = SimulationCache().timeline(long_spec, 72.5, STOCKS[0], 1.15, START, True, "Private")
+    report = build_report(long_spec.indication, long_spec.name, 72.5, 15, "Private", p1, p2, total, rounds, timeline, cap)
+
+    def timeline_long():
+        SimulationCache().timeline(long_spec, 72.5, STOCKS[0], 1.15, START, True, "Private")[4].display
+
+    results = {
+        "vials.sweep.cold": _median(vials_sweep, repeat, setup=cold),
+        "vials.sweep.warm": _median(vials_sweep, repeat),
+        "simulation.all_regimens.cold": _median(simulate_all, repeat, setup=cold),
+        "simulation.all_regimens.warm": _median(simulate_all, repeat),
+        "summary.all_regimens.warm": _median(summarize_all, repeat, number=50),
+        "compare.all.government": _median(compare_all, repeat, number=50),
+        "bands.all_regimens.build": _median(bands_all, repeat),
+        "timeline.long.display": _median(timeline_long, repeat),
+        "image.png.long": _median(lambda: render_png(report), repeat),
+    }
+    tracemalloc.start(); render_png(report); results["image.png.long.peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return results
+
+
+# ---------- driver ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update", action="store_true", help="record a new baseline instead of checking")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--max-slowdown", type=float, default=float(os.environ.get("OYCALC_BENCH_SLOWDOWN", 1.5)))
+    args = ap.parse_args(argv)
+
+    data = load_fixtures()
+    golden = golden_totals(data)
+    mismatches = cross_check(data, golden)
+    timings = benchmarks(data, args.repeat)
+    for name, value in timings.items():
+        unit = "MB" if name.endswith("_mb") else "ms"
+        print(f"{name:32s} {value if unit == 'MB' else value * 1000:9.2f} {unit}")
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                       "timings": timings, "totals": golden}, f, indent=1, sort_keys=True)
+        print(f"✅ baseline written: {len(golden)} totals, {len(timings)} timings -> {args.baseline}")
+        for m in mismatches[:50]:
+            print(f"❌ engines disagree: {m}")
+        return 1 if mismatches else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = [f"engines disagree: {m}" for m in mismatches]
+    for key, expected in baseline["totals"].items():
+        got = golden.get(key)
+        if got != expected:
+            failures.append(f"total changed: {key}: {expected:,} -> {got if got is None else f'{got:,}'}")
+    failures += [f"new grid point without baseline: {k}" for k in golden.keys() - baseline["totals"].keys()]
+    for name, base in baseline["timings"].items():
+        if name in timings and base > 0 and timings[name] > base * args.max_slowdown:
+            failures.append(f"slower: {name} {timings[name] / base:.2f}x baseline (limit {args.max_slowdown}x)")
+
+    for msg in failures[:50]:
+        print(f"❌ {msg}")
+    if len(failures) > 50:
+        print(f"... and {len(failures) - 50} more")
+    if failures:
+        return 1
+    print(f"✅ {len(golden)} totals unchanged, {len(timings)} timings within {args.max_slowdown}x of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
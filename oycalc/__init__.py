@@ -0,0 +1,43 @@
+"""Pricing engine for the O+Y PAP calculator.
+
+Names are imported from their submodule on first access (PEP 562), so
+``from oycalc import counter_from_env`` on the login page does not pull in
+pandas / NumPy with the pricing engine.
+"""
+import importlib
+
+_EXPORTS = {
+    'vials': ['PRICES', 'VialTable', 'calculate_vials', 'get_vial_table', 'memo_stats', 'vial_options'],
+    'regimen': ['Dose', 'RegimenSpec', 'as_spec', 'get_val', 'parse_regimens'],
+    'simulation': ['run_simulation'],
+    'summary': ['Totals', 'simulate_totals'],
+    'bands': ['PriceBand', 'PriceIndex', 'get_price_index', 'index_stats'],
+    'batch': ['Schedule', 'compile_schedule', 'simulate_batch'],
+    'whatif': ['SimulationCache'],
+    'timeline': ['DISPLAY_AMOUNTS', 'Timeline'],
+    'compare': ['CompareResult', 'RegimenComparer'],
+    'counter': ['CounterApiBackend', 'SQLiteBackend', 'VisitCounter', 'counter_from_env'],
+    'report': ['Report', 'build_report', 'render_pdf', 'render_png', 'render_png_matplotlib', 'render_svg'],
+    'datasource': ['FileSource', 'GoogleSheetSource', 'RegimenData', 'RegimenStore', 'store_from_env'],
+    'quote': ['QuoteStats', 'RegimenIndex', 'quote_csv'],
+    'service': ['QuoteService'],
+    'pooling': ['PoolingPlan', 'plan_pooling', 'pool_csv'],
+}
+_WHERE = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = ['instrument'] + [name for names in _EXPORTS.values() for name in names]
+
+
+def __getattr__(name):
+    if name == 'instrument':
+        return importlib.import_module('.instrument', __name__)
+    module = _WHERE.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,66 @@
+"""Command line: ``python -m oycalc quote patients.csv -o totals.csv`` / ``pool`` / ``serve``."""
+import argparse
+import sys
+
+from .quote import DEFAULT_CHUNKSIZE, print_progress, quote_csv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m oycalc", description="O+Y PAP pricing engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("quote", help="price a CSV of patients")
+    q.add_argument("input", help="patient CSV (patient_id, indication, regimen, weight, sector, markup, "
+                                 "start_date, stock, skip_weekend, round_down)")
+    q.add_argument("-o", "--output", required=True, help="per-patient totals, .csv or .parquet")
+    q.add_argument("--timelines", help="also write every cycle to this .csv or .parquet file")
+    q.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows read and priced per task")
+    q.add_argument("--workers", type=int, default=None, help="worker processes (0 = run in this process)")
+    q.add_argument("--quiet", action="store_true", help="no per-chunk progress lines")
+
+    pool = sub.add_parser("pool", help="shared-vial purchase plan per appointment day for a patient CSV")
+    pool.add_argument("input", help="patient CSV, same columns as for quote")
+    pool.add_argument("-o", "--output", required=True, help="one row per day, .csv or .parquet")
+    pool.add_argument("--stock", default="40;100;120", help="Opdivo vial sizes the center buys")
+    pool.add_argument("--multiplier", type=float, default=1.0, help="vial price multiplier (1.0 = purchase price)")
+
+    srv = sub.add_parser("serve", help="local HTTP JSON quotation service")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8765)
+    srv.add_argument("--workers", type=int, default=None, help="worker processes (0 = one thread in this process)")
+    srv.add_argument("--max-queue", type=int, default=4096, help="quotes waiting for a worker before answering 503")
+    args = parser.parse_args(argv)
+
+    if args.command == "quote":
+        stats = quote_csv(args.input, args.output, args.timelines, chunksize=args.chunksize,
+                          workers=args.workers, progress=None if args.quiet else print_progress)
+        print(f"✅ quote: {stats.line()}", file=sys.stderr)
+        return 1 if stats.rows and stats.errors == stats.rows else 0
+
+    if args.command == "pool":
+        from .pooling import pool_csv
+        from .quote import ChunkWriter, _parse_stock
+        plan = pool_csv(args.input, stock=_parse_stock(args.stock), multiplier=args.multiplier)
+        writer = ChunkWriter(args.output)
+        writer.write(plan.days)
+        writer.close()
+        print(f"✅ pool: {plan.line()}" + (f", {len(plan.rejected):,} rows rejected" if plan.rejected else ""), file=sys.stderr)
+        return 1 if plan.rejected and not plan.patients else 0
+
+    if args.command == "serve":
+        import asyncio
+        from .service import QuoteService
+        service = QuoteService(workers=args.workers, max_queue=args.max_queue)
+        ready = lambda server: print(f"✅ serving quotes on http://{args.host}:{server.sockets[0].getsockname()[1]}"
+                                     f" ({service.workers} workers)", file=sys.stderr, flush=True)
+        try:
+            asyncio.run(service.serve(args.host, args.port, ready))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
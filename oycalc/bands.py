@@ -0,0 +1,121 @@
+"""Weight-breakpoint price index: a regimen's PAP total as a step function of weight.
+
+Vials are whole, so the total only changes at the weights where the vial
+combination (or its cost) of the P1 Opdivo, P2 Opdivo or Yervoy dose changes.
+``PriceIndex`` finds those weights exactly - the first float weight at which
+each dose reaches the next changing whole-mg index - and keeps one
+``PriceBand`` per interval.  Pricing a weight is then a binary search.
+
+A band is priced with ``simulate_totals`` at its lower edge.  Every weight in
+the band gives the same three vial costs, so a lookup is bit-identical to
+``simulate_totals`` at that weight.  Weights outside ``[lo, hi]`` (the app's
+weight input by default) fall back to ``simulate_totals``.
+"""
+import math
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from . import instrument
+from .batch import compile_schedule
+from .regimen import as_spec
+from .summary import simulate_totals
+from .vials import ROUND_DOWN_ALLOWANCE, calculate_vials, get_vial_table
+
+MIN_WEIGHT, MAX_WEIGHT = 1.0, 150.0
+
+PriceBand = namedtuple('PriceBand', 'lo hi totals p1_o_vials p2_o_vials y_vials')
+
+
+def _whole_mg(mg):
+    return math.ceil(mg) if mg > 0 else 0       # VialTable's row for a dose
+
+
+def _first_weight(index_at, n, guess):
+    """Smallest float weight with ``index_at(weight) >= n``; ``index_at`` never decreases."""
+    w = guess
+    while index_at(w) >= n:
+        w = math.nextafter(w, -math.inf)
+    while index_at(w) < n:
+        w = math.nextafter(w, math.inf)
+    return w
+
+
+class PriceIndex:
+    """Price bands of one (regimen, stock, markup, sector, round mode).
+
+    ``bands[i]`` covers ``starts[i] <= weight < starts[i + 1]``; the last band
+    also holds ``hi``.
+    """
+
+    def __init__(self, spec, stock_o, multiplier, sector, round_down_mode=False, lo=MIN_WEIGHT, hi=MAX_WEIGHT):
+        self.spec = spec = as_spec(spec)
+        self.args = (tuple(sorted(stock_o)), multiplier, sector, bool(round_down_mode))
+        self.lo, self.hi = lo, hi
+        with instrument.span("bands.build"):
+            self.starts = self._breakpoints()
+            self.bands = [self._band(a, b) for a, b in zip(self.starts, self.starts[1:] + [hi])]
+
+    def _breakpoints(self):
+        spec, (stock, multiplier, _, round_down) = self.spec, self.args
+        sched = compile_schedule(spec)
+        o_table, y_table = get_vial_table('O', stock, multiplier), get_vial_table('Y', [50], multiplier)
+        allowance = ROUND_DOWN_ALLOWANCE if round_down else 0.0
+        doses = []
+        if sched.is_p1.any(): doses.append((o_table, spec.p1_o, 0.0))
+        if not sched.is_p1.all(): doses.append((o_table, spec.p2_o, 0.0))
+        if sched.y_admin.any(): doses.append((y_table, spec.p1_y, allowance))
+
+        starts = {self.lo}
+        for table, dose, allow in doses:
+            if not (dose.per_kg and dose.amount > 0):
+                continue        # a fixed dose costs the same at every weight
+            if allow:
+                index_at = lambda w, d=dose: _whole_mg(max(0, d.mg(w) - ROUND_DOWN_ALLOWANCE))
+            else:
+                index_at = lambda w, d=dose: _whole_mg(d.mg(w))
+            for n in table.change_points(index_at(self.lo), index_at(self.hi)):
+                starts.add(_first_weight(index_at, n, (n - 1 + allow) / dose.amount))
+        return sorted(starts)
+
+    def _band(self, lo, hi):
+        spec, (stock, multiplier, sector, round_down) = self.spec, self.args
+        return PriceBand(lo, hi, simulate_totals(spec, lo, stock, multiplier, sector, round_down),
+                         calculate_vials(spec.p1_o.mg(lo), 'O', stock, multiplier)[1],
+                         calculate_vials(spec.p2_o.mg(lo), 'O', stock, multiplier)[1],
+                         calculate_vials(spec.p1_y.mg(lo), 'Y', [50], multiplier, round_down=round_down)[1])
+
+    def __len__(self):
+        return len(self.bands)
+
+    def band(self, weight):
+        """The band holding ``weight``, or None outside ``[lo, hi]``."""
+        if not self.lo <= weight <= self.hi:
+            return None
+        return self.bands[bisect_right(self.starts, weight) - 1]
+
+    def totals(self, weight):
+        """Same ``Totals`` as ``simulate_totals`` at this weight."""
+        band = self.band(weight)
+        return band.totals if band is not None else simulate_totals(self.spec, weight, *self.args)
+
+    def between(self, lo, hi):
+        """Bands overlapping ``[lo, hi]``."""
+        first = max(0, bisect_right(self.starts, lo) - 1)
+        return self.bands[first:bisect_right(self.starts, hi)]
+
+
+@lru_cache(maxsize=1024)
+def _price_index(spec, stock, multiplier, government, round_down):
+    return PriceIndex(spec, stock, multiplier, "Government" if government else "Private", round_down)
+
+
+def get_price_index(spec, stock_o, multiplier, sector, round_down_mode=False):
+    """Shared index for this (regimen, stock, markup, sector, round mode), LRU-cached."""
+    return _price_index(as_spec(spec), tuple(sorted(stock_o)), multiplier,
+                        str(sector).lower() == "government", bool(round_down_mode))
+
+
+def index_stats():
+    info = _price_index.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'indexes': info.currsize}
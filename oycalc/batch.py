@@ -0,0 +1,150 @@
+"""Vectorized PAP pricing over a grid of regimens x weights x markups.
+
+Each regimen is compiled once into a ``Schedule``: the cycle/week/month
+timeline and the pay factor of every administration.  None of that depends on
+weight or markup (doses are either zero or not, whatever the weight), so a whole
+grid only needs the per-phase vial cost for each (weight, markup) pair, looked
+up from the shared vial tables, and one NumPy pass per regimen.
+
+Totals are accumulated cycle by cycle in the same order as ``run_simulation``,
+so they match the scalar function exactly.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .regimen import RegimenSpec, as_spec, parse_regimens
+from .vials import O_SIZES, ROUND_DOWN_ALLOWANCE, get_vial_table
+
+HORIZON_WEEKS = 104
+RESULT_COLUMNS = ['weight', 'markup', 'total_paid', 'o_paid_rounds', 'p1_cycle_cost',
+                  'p2_cycle_cost', 'cap_months', 'has_p2']
+
+
+@dataclass(frozen=True, eq=False)
+class Schedule:
+    """Weight-independent timeline of one regimen."""
+    spec: RegimenSpec
+    is_p1: np.ndarray        # bool, one entry per cycle
+    week: np.ndarray
+    month: np.ndarray
+    o_factor: np.ndarray     # 1.0 paid, 0.5 boundary cycle, 0.0 free
+    y_admin: np.ndarray      # Yervoy given this cycle
+    y_due: np.ndarray        # Yervoy would be paid, before the Government cap
+    y_full: np.ndarray       # Yervoy pay period ends inside the cap
+    o_paid_rounds: float
+
+    @property
+    def cycles(self):
+        return len(self.week)
+
+    def y_factor(self, sector):
+        due = self.y_due
+        # 🏛️ GOVERNMENT RULE: at most two paid Yervoy rounds
+        if str(sector).lower() == "government":
+            due = due & (np.cumsum(due) <= 2)
+        return np.where(due, np.where(self.y_full, 1.0, 0.5), 0.0)
+
+
+def compile_schedule(spec):
+    spec = as_spec(spec)
+    p1_limit, p1_o_freq, p1_y_freq = max(spec.p1_cycle_limit, 0), spec.p1_o_freq, spec.p1_y_freq
+    cap_limit = spec.cap_months
+
+    n1 = min(p1_limit, (HORIZON_WEEKS - 1) // p1_o_freq + 1)
+    p1_weeks = 1 + np.arange(n1) * p1_o_freq
+    if spec.has_p2 and n1 == p1_limit:
+        p2_weeks = np.arange(1 + n1 * p1_o_freq, HORIZON_WEEKS + 1, spec.p2_freq)
+    else:
+        p2_weeks = np.arange(0)
+    week = np.concatenate([p1_weeks, p2_weeks]).astype(np.int64)
+    is_p1 = np.arange(len(week)) < n1
+    freq = np.where(is_p1, p1_o_freq, spec.p2_freq)
+    month = (week - 1) // 4 + 1
+    in_cap = month <= cap_limit
+
+    o_dose = np.where(is_p1, spec.p1_o.amount, spec.p2_o.amount)
+    o_admin = (o_dose > 0) & in_cap
+    o_pay = o_admin & (np.cumsum(o_admin) % 2 == 1)
+    o_full = ((week + freq - 1) // 4 + 1) <= cap_limit
+    o_factor = np.where(o_pay, np.where(o_full, 1.0, 0.5), 0.0)
+
+    y_admin = is_p1 & ((week - 1) % p1_y_freq == 0) & (spec.p1_y.amount > 0)
+    y_in_cap = y_admin & in_cap
+    y_due = y_in_cap & (np.cumsum(y_in_cap) % 2 == 1)
+    y_full = ((week + p1_y_freq - 1) // 4 + 1) <= cap_limit
+
+    return Schedule(spec, is_p1, week, month, o_factor, y_admin, y_due, y_full, float(o_factor.sum()))
+
+
+def _mg(dose, weights):
+    return dose.amount * weights if dose.per_kg else np.full(weights.shape, dose.amount)
+
+
+def _lookup(costs, m_idx, mg, round_down=False):
+    """Vectorized ``calculate_vials`` cost: ``costs[m]`` is the cost-by-mg row of multiplier m."""
+    target = np.maximum(0, mg - ROUND_DOWN_ALLOWANCE) if round_down else mg
+    idx = np.where(target > 0, np.ceil(target), 0).astype(np.int64)
+    return np.where(mg > 0, costs[m_idx, idx], 0.0)
+
+
+def _first(values, mask):
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0])
+    pos = mask.argmax(axis=1)
+    return np.where(mask.any(axis=1), values[np.arange(values.shape[0]), pos], 0.0)
+
+
+def simulate_batch(regimens_df, weights, markups, stock=O_SIZES, sector="Government", round_down=False, specs=None):
+    """Price every regimen row at every (weight, markup) pair.
+
+    Returns a long-format DataFrame with one row per (regimen, weight, markup);
+    the regimen's ``Indication_Group`` / ``Regimen_Name`` columns are carried over
+    when present.  Pass ``specs`` (from ``parse_regimens``) to skip re-parsing.
+    """
+    weights = np.asarray(weights, dtype=float)
+    markups = np.asarray(markups, dtype=float)
+    multipliers = 1 + markups / 100
+    w = np.repeat(weights, len(markups))        # grid point k -> (weight, markup)
+    m_idx = np.tile(np.arange(len(markups)), len(weights))
+
+    if specs is None:
+        specs, _ = parse_regimens(regimens_df)
+    rows = [row for _, row in regimens_df.iterrows()]
+    schedules = [compile_schedule(specs[i]) for i in regimens_df.index]
+    doses = [(_mg(s.spec.p1_o, w), _mg(s.spec.p2_o, w), _mg(s.spec.p1_y, w)) for s in schedules]
+    max_mg = max([1] + [int(np.ceil(d.max())) for ds in doses for d in ds if d.size])
+    o_costs = np.stack([np.asarray(get_vial_table('O', stock, m).cost_array(max_mg)) for m in multipliers])
+    y_costs = np.stack([np.asarray(get_vial_table('Y', [50], m).cost_array(max_mg)) for m in multipliers])
+
+    id_cols = [c for c in ('Indication_Group', 'Regimen_Name') if c in regimens_df.columns]
+    frames = []
+    for row, s, (o1_mg, o2_mg, y_mg) in zip(rows, schedules, doses):
+        o1 = _lookup(o_costs, m_idx, o1_mg)
+        o2 = _lookup(o_costs, m_idx, o2_mg)
+        yc = _lookup(y_costs, m_idx, y_mg, round_down)
+
+        o_cost = np.where(s.is_p1[None, :], o1[:, None], o2[:, None])
+        o_p = np.where(s.o_factor > 0, o_cost * s.o_factor, 0.0)
+        y_factor = s.y_factor(sector)
+        y_p = np.where(y_factor > 0, yc[:, None] * y_factor, 0.0)
+        paid = o_p + y_p
+        # cumsum adds cycle by cycle, exactly like the scalar loop
+        total = np.cumsum(paid, axis=1)[:, -1] if s.cycles else np.zeros(len(w))
+
+        # Per-cycle cost is the first paid cycle of each phase.
+        positive = paid > 0
+        frame = pd.DataFrame({
+            'weight': w, 'markup': markups[m_idx], 'total_paid': total,
+            'o_paid_rounds': s.o_paid_rounds,
+            'p1_cycle_cost': _first(paid, positive & s.is_p1[None, :]),
+            'p2_cycle_cost': _first(paid, positive & ~s.is_p1[None, :]),
+            'cap_months': s.spec.cap_months, 'has_p2': s.spec.has_p2,
+        })
+        for c in reversed(id_cols):
+            frame.insert(0, c, row[c])
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=id_cols + RESULT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,85 @@
+"""Regimen comparison on the weight-band price index, with memoized results."""
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+from . import instrument
+from .regimen import as_spec
+from .bands import get_price_index
+from .workers import process_pool
+
+CompareResult = namedtuple('CompareResult', 'name total o_rounds p1_cost p2_cost')
+
+
+def summarize(spec, weight, stock, multiplier, sector, round_down):
+    total, o_rounds, p1_c, p2_c, _, _ = get_price_index(spec, stock, multiplier, sector, round_down).totals(weight)
+    return CompareResult(spec.name, total, o_rounds, p1_c, p2_c)
+
+
+class RegimenComparer:
+    """``compare()`` returns one ``CompareResult`` per spec, in input order.
+
+    Results are memoized on (spec, weight, stock, multiplier, sector, round
+    mode) with LRU eviction - totals do not depend on the start date.  A miss
+    is a binary search in the regimen's shared ``PriceIndex`` (about a
+    millisecond to build the first time), so misses only go to the process
+    pool once there are at least ``min_parallel`` of them.
+    """
+
+    def __init__(self, max_workers=None, maxsize=2048, min_parallel=256):
+        self.max_workers = max_workers
+        self.maxsize = maxsize
+        self.min_parallel = min_parallel
+        self.hits = self.misses = 0
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = process_pool(self.max_workers)
+        return self._pool
+
+    def compare(self, specs, weight, stock, multiplier, start_dt, skip_wknd, sector, round_down=False):
+        """``start_dt`` / ``skip_wknd`` are accepted for symmetry with ``run_simulation`` and ignored."""
+        specs = [as_spec(s) for s in specs]
+        args = (weight, tuple(sorted(stock)), multiplier, str(sector), bool(round_down))
+        keys = [(spec,) + args for spec in specs]
+        results = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    results[key] = self._memo[key]
+            missing = list(dict.fromkeys(k for k in keys if k not in results))
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        instrument.incr("compare.memo_hit", len(keys) - len(missing))
+        instrument.incr("compare.memo_miss", len(missing))
+
+        for key, res in zip(missing, self._simulate(missing)):
+            results[key] = res
+        with self._lock:
+            for key in missing:
+                self._memo[key] = results[key]
+            while len(self._memo) > self.maxsize:
+                self._memo.popitem(last=False)
+        return [results[k] for k in keys]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._memo), 'pool': self._pool is not None}
+
+    def _simulate(self, keys):
+        if len(keys) >= self.min_parallel:
+            try:
+                return list(self._executor().map(summarize, *zip(*keys)))
+            except (BrokenProcessPool, OSError) as e:
+                print(f"⚠️ compare pool unavailable, running serially: {e}")
+                self._pool = None
+        return [summarize(*k) for k in keys]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
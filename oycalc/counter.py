@@ -0,0 +1,178 @@
+"""Visit counter that never blocks the page.
+
+``VisitCounter`` answers ``count()`` from memory and refreshes it on a worker
+thread once it is older than ``ttl``; ``increment()`` only queues the hit, and the
+worker flushes queued hits to the backend in batches, and once more at
+interpreter exit.  Backends:
+
+* ``CounterApiBackend`` - api.counterapi.dev over a pooled ``requests.Session``,
+* ``SQLiteBackend`` - a local file, for offline runs and tests.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from . import instrument
+
+COUNTER_NAMESPACE = "oy_calc_pro_th"
+COUNTER_KEY = "visits"
+
+
+class CounterApiBackend:
+    def __init__(self, namespace=COUNTER_NAMESPACE, key=COUNTER_KEY, timeout=2):
+        self.base = f"https://api.counterapi.dev/v1/{namespace}/{key}"
+        self.timeout = timeout
+        self._session = None
+
+    @property
+    def session(self):
+        # requests is imported on the worker thread's first call, not while the login page renders
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            self._session = session
+        return self._session
+
+    def read(self):
+        return int(self.session.get(self.base, timeout=self.timeout).json().get("count", 0))
+
+    def add(self, n):
+        """``(hits counted, latest total)``; stops at the first failed call, raises if none got through."""
+        # The v1 API only counts up one at a time; at least the calls share a connection.
+        done, count = 0, None
+        for _ in range(n):
+            try:
+                resp = self.session.get(f"{self.base}/up", timeout=self.timeout)
+                resp.raise_for_status()
+            except Exception:
+                if not done: raise
+                break
+            done += 1
+            count = resp.json().get("count", count)
+        return done, count
+
+
+class SQLiteBackend:
+    def __init__(self, path, key=COUNTER_KEY):
+        self.path = path
+        self.key = key
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            db.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (key,))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def read(self):
+        with self._connect() as db:
+            return db.execute("SELECT count FROM counters WHERE key = ?", (self.key,)).fetchone()[0]
+
+    def add(self, n):
+        with self._connect() as db:
+            db.execute("UPDATE counters SET count = count + ? WHERE key = ?", (n, self.key))
+            return n, db.execute("SELECT count FROM counters WHERE key = ?", (self.key,)).fetchone()[0]
+
+
+class VisitCounter:
+    def __init__(self, backend, ttl=60, flush_interval=5, batch_size=20):
+        self.backend = backend
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._count = None          # last value seen from the backend
+        self._read_at = 0.0
+        self._pending = 0           # queued or failed hits not yet in _count
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True, name="visit-counter")
+        self._worker.start()
+        atexit.register(self.close)
+
+    def count(self):
+        """Best known total (None until the first read lands); never waits on the backend."""
+        with self._lock:
+            stale = time.monotonic() - self._read_at > self.ttl
+            value = None if self._count is None else self._count + self._pending
+        if stale:
+            self._queue.put("read")
+        return value
+
+    def increment(self):
+        with self._lock:
+            self._pending += 1
+        self._queue.put("hit")
+
+    def flush(self, timeout=None):
+        """Ask the worker to push pending hits now and wait for it (for shutdown/tests)."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Push hits still pending (registered with ``atexit``)."""
+        with self._lock:
+            pending = self._pending
+        if pending:
+            self.flush(timeout)
+
+    # ---------- worker ----------
+    def _run(self):
+        last_push = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            read, waiters = False, []
+            # Drain whatever else is queued so bursts collapse into one round trip.
+            while item is not None:
+                if item == "read": read = True
+                elif isinstance(item, threading.Event): waiters.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            with self._lock:
+                pending = self._pending
+            if pending and (waiters or pending >= self.batch_size
+                            or time.monotonic() - last_push >= self.flush_interval):
+                self._push(pending)
+                last_push = time.monotonic()
+            if read and time.monotonic() - self._read_at > self.ttl:
+                self._read()
+            for w in waiters: w.set()
+
+    def _push(self, n):
+        try:
+            with instrument.span("counter.push"):
+                done, total = self.backend.add(n)
+        except Exception as e:
+            print(f"⚠️ visit counter flush failed ({n} pending): {e}")
+            return
+        if done < n: print(f"⚠️ visit counter flush stopped after {done} of {n} hits, the rest stay pending")
+        with self._lock:
+            self._pending -= done       # only what the backend counted; the rest is retried
+            if total is not None:
+                self._count, self._read_at = total, time.monotonic()
+            elif self._count is not None:
+                self._count += done
+
+    def _read(self):
+        try:
+            with instrument.span("counter.read"):
+                total = self.backend.read()
+        except Exception:
+            total = self._count or 0
+        with self._lock:
+            self._count, self._read_at = total, time.monotonic()
+
+
+def counter_from_env():
+    """``OYCALC_COUNTER_FILE`` switches to a local SQLite counter (offline runs)."""
+    path = os.environ.get("OYCALC_COUNTER_FILE")
+    return VisitCounter(SQLiteBackend(path) if path else CounterApiBackend())
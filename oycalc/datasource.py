@@ -0,0 +1,216 @@
+"""Regimen sheet data sources with a local snapshot cache.
+
+``RegimenStore`` keeps one parsed snapshot per sector tab, in memory and on disk
+(Parquet + a small JSON sidecar).  A snapshot younger than ``ttl`` is served
+as is; an older one is still served immediately while a background thread
+revalidates it (stale-while-revalidate).  Revalidation sends the last ETag and
+compares a SHA-256 of the payload, so an unchanged sheet is never reparsed.
+
+Sources return raw CSV bytes:
+
+* ``GoogleSheetSource`` - the published gviz CSV export (the default),
+* ``FileSource`` - ``<directory>/<tab>.csv``, for tests and air-gapped installs.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from . import instrument
+
+# pandas and the regimen parser are imported on first parse, so building a store is cheap
+
+SHEET_ID = "1YXD44pN5mLwazxOiXCHHcylvB082jdtNivXX4VpXdJM"
+DEFAULT_TTL = 15 * 60
+
+
+@dataclass
+class Fetched:
+    content: bytes = None      # None: not modified since ``etag``
+    etag: str = None
+
+
+class GoogleSheetSource:
+    def __init__(self, sheet_id=SHEET_ID, timeout=20, session=None):
+        self.sheet_id = sheet_id
+        self.timeout = timeout
+        self.session = session
+
+    def url(self, tab):
+        return f"https://docs.google.com/spreadsheets/d/{self.sheet_id}/gviz/tq?tqx=out:csv&sheet={tab}"
+
+    def fetch(self, tab, etag=None):
+        import requests
+        http = self.session or requests
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = http.get(self.url(tab), headers=headers, timeout=self.timeout)
+        if resp.status_code == 304:
+            return Fetched(None, etag)
+        resp.raise_for_status()
+        return Fetched(resp.content, resp.headers.get("ETag"))
+
+
+class FileSource:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, tab, etag=None):
+        path = os.path.join(self.directory, f"{tab}.csv")
+        st = os.stat(path)
+        tag = f"{st.st_mtime_ns}-{st.st_size}"
+        if tag == etag:
+            return Fetched(None, etag)
+        with open(path, "rb") as f:
+            return Fetched(f.read(), tag)
+
+
+@dataclass
+class RegimenData:
+    df: 'pd.DataFrame'
+    specs: 'pd.Series'
+    issues: list
+    digest: str
+    etag: str = None
+    fetched_at: float = field(default_factory=time.time)
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+def _digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _parse(content, digest, etag, tab):
+    import pandas as pd
+    from .regimen import parse_regimens
+    df = pd.read_csv(io.BytesIO(content))
+    specs, issues = parse_regimens(df)
+    for msg in issues: print(f"⚠️ [{tab}] {msg}")
+    return RegimenData(df, specs, issues, digest, etag)
+
+
+class RegimenStore:
+    def __init__(self, source=None, cache_dir=None, ttl=DEFAULT_TTL):
+        self.source = source or GoogleSheetSource()
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._data = {}
+        self._refreshing = set()
+        self._loading = {}              # tab -> lock held while that tab loads cold
+        self._lock = threading.Lock()   # guards _refreshing and _loading only, never held over I/O
+
+    # ---------- public ----------
+    def get(self, tab):
+        """Current data for ``tab``; only blocks when nothing is cached anywhere."""
+        data = self._data.get(tab)
+        instrument.incr("store.memory_hit" if data is not None else "store.memory_miss")
+        if data is None:
+            with self._lock:
+                loading = self._loading.setdefault(tab, threading.Lock())
+            # only readers of this tab wait for its cold load; other tabs and refreshes go on
+            with loading:
+                data = self._data.get(tab) or self._load_snapshot(tab)
+                if data is None:
+                    data = self._refresh(tab, None)
+                self._data[tab] = data
+        if data.age() > self.ttl:
+            self.refresh_async(tab)
+        return data
+
+    def refresh_async(self, tab):
+        with self._lock:
+            if tab in self._refreshing:
+                return
+            self._refreshing.add(tab)
+        threading.Thread(target=self._refresh_worker, args=(tab,), daemon=True,
+                         name=f"regimen-refresh-{tab}").start()
+
+    def refresh(self, tab):
+        """Revalidate now (blocking)."""
+        data = self._refresh(tab, self._data.get(tab))
+        self._data[tab] = data
+        return data
+
+    # ---------- internals ----------
+    def _refresh_worker(self, tab):
+        try:
+            self.refresh(tab)
+        except Exception as e:
+            # Keep serving the stale copy; the next stale read retries.
+            print(f"⚠️ [{tab}] sheet refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(tab)
+
+    def _refresh(self, tab, current):
+        with instrument.span("sheet.fetch"):
+            fetched = self.source.fetch(tab, current.etag if current else None)
+        if current is not None:
+            if fetched.content is None or _digest(fetched.content) == current.digest:
+                data = RegimenData(current.df, current.specs, current.issues, current.digest, fetched.etag or current.etag)
+                self._save_meta(tab, data)
+                return data
+        if fetched.content is None:
+            raise RuntimeError(f"{tab}: source reported not-modified with nothing cached")
+        with instrument.span("sheet.parse"):
+            data = _parse(fetched.content, _digest(fetched.content), fetched.etag, tab)
+        self._save_snapshot(tab, data)
+        return data
+
+    def _paths(self, tab):
+        base = os.path.join(self.cache_dir, tab)
+        return base + ".parquet", base + ".json"
+
+    def _load_snapshot(self, tab):
+        if not self.cache_dir:
+            return None
+        import pandas as pd
+        from .regimen import parse_regimens
+        data_path, meta_path = self._paths(tab)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            df = pd.read_parquet(data_path)
+        except (OSError, ValueError, ImportError):
+            return None
+        specs, issues = parse_regimens(df)
+        return RegimenData(df, specs, issues, meta["digest"], meta.get("etag"), meta["fetched_at"])
+
+    def _save_snapshot(self, tab, data):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, _ = self._paths(tab)
+        try:
+            data.df.to_parquet(data_path + ".tmp", index=False)
+            os.replace(data_path + ".tmp", data_path)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"⚠️ [{tab}] could not write snapshot: {e}")
+            return
+        self._save_meta(tab, data)
+
+    def _save_meta(self, tab, data):
+        if not self.cache_dir:
+            return
+        _, meta_path = self._paths(tab)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"digest": data.digest, "etag": data.etag, "fetched_at": data.fetched_at}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+def store_from_env():
+    """Store configured from ``OYCALC_*`` environment variables.
+
+    ``OYCALC_DATA_DIR``  read ``<dir>/<tab>.csv`` instead of the Google sheet
+    ``OYCALC_CACHE_DIR`` where snapshots are kept (default ``.oycalc_cache``)
+    ``OYCALC_SHEET_TTL`` seconds before a snapshot is revalidated (default 900)
+    """
+    data_dir = os.environ.get("OYCALC_DATA_DIR")
+    source = FileSource(data_dir) if data_dir else GoogleSheetSource()
+    cache_dir = os.environ.get("OYCALC_CACHE_DIR", ".oycalc_cache") or None
+    ttl = float(os.environ.get("OYCALC_SHEET_TTL", DEFAULT_TTL))
+    return RegimenStore(source, cache_dir, ttl)
@@ -0,0 +1,189 @@
+"""Timing spans, counters and gauges for the hot paths.
+
+Off unless ``OYCALC_TRACE=1`` (or ``enable()``); while off, ``span()`` hands
+back one shared no-op context manager, so an instrumented call costs a global
+lookup and an ``if``.
+
+While on, each span is recorded twice:
+
+* in the process-wide ``PROCESS`` recorder, and
+* in the recorder bound to the current Streamlit session (``bind_session``),
+  which also sums the spans of the current script run for ``log_run``
+  (``track_run=True``; other recorders keep only their windows).
+
+Recorders keep the last ``window`` samples per name and report rolling
+percentiles.  ``span(name, memory=True)`` also records peak traced memory as
+``<name>.peak_mb``.  Gauges are callables (cache stats, memo sizes) that are
+only evaluated when a snapshot is taken.
+"""
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+
+DEFAULT_WINDOW = 500
+LOG_PREFIX = "OYCALC_TRACE"
+
+_enabled = os.environ.get("OYCALC_TRACE", "").strip().lower() in ("1", "true", "yes", "on")
+_NOOP = nullcontext()
+_session = ContextVar("oycalc_trace_session", default=None)
+_gauges = {}
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def _percentile(ordered, q):
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]     # nearest rank
+
+
+class Recorder:
+    """Rolling window of samples per span name, plus plain counters.
+
+    With ``track_run`` the samples since ``begin_run`` are also summed per
+    name (one float per name, so a recorder that is never reset stays small).
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, track_run=False):
+        self.window = window
+        self.track_run = track_run
+        self._samples = {}
+        self._counters = Counter()
+        self._run = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(value)
+            if self.track_run:
+                self._run[name] = self._run.get(name, 0.0) + value
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def begin_run(self):
+        with self._lock:
+            self._run = {}
+
+    def run(self):
+        """Samples recorded since ``begin_run``, summed per name (empty unless ``track_run``)."""
+        with self._lock:
+            return dict(self._run)
+
+    def summary(self):
+        """``{name: {'n', 'p50', 'p90', 'p99', 'max'}}`` over the window (ms, or MB for ``*.peak_mb``)."""
+        with self._lock:
+            windows = {name: sorted(s) for name, s in self._samples.items()}
+        return {name: {'n': len(s), 'p50': _percentile(s, 0.5), 'p90': _percentile(s, 0.9),
+                       'p99': _percentile(s, 0.99), 'max': s[-1]} for name, s in sorted(windows.items()) if s}
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+            self._run = {}
+
+
+PROCESS = Recorder()
+
+
+class _Span:
+    __slots__ = ('name', 'memory', 't0', 'traced')
+
+    def __init__(self, name, memory):
+        self.name, self.memory = name, memory
+
+    def __enter__(self):
+        if self.memory:
+            self.traced = tracemalloc.is_tracing()
+            if self.traced:
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000
+        session = _session.get()
+        PROCESS.add(self.name, ms)
+        if session is not None:
+            session.add(self.name, ms)
+        if self.memory:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            if not self.traced:
+                tracemalloc.stop()
+            PROCESS.add(self.name + ".peak_mb", peak_mb)
+            if session is not None:
+                session.add(self.name + ".peak_mb", peak_mb)
+        return False
+
+
+def span(name, memory=False):
+    """``with span("simulate.main"): ...`` - no-op while tracing is off."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, memory)
+
+
+def incr(name, n=1):
+    if not _enabled:
+        return
+    PROCESS.incr(name, n)
+    session = _session.get()
+    if session is not None:
+        session.incr(name, n)
+
+
+def bind_session(recorder):
+    """Route spans of this thread (one Streamlit script run) to ``recorder`` too, and start a new run."""
+    _session.set(recorder)
+    if recorder is not None:
+        recorder.begin_run()
+
+
+def register_gauge(name, fn):
+    """``fn()`` is called for every snapshot; it should be cheap and return JSON-able data."""
+    _gauges[name] = fn
+
+
+def gauges():
+    out = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            out[name] = fn()
+        except Exception as e:  # a broken gauge must not break the page
+            out[name] = f"error: {e}"
+    return out
+
+
+def log_run(**fields):
+    """Print one structured line for the current script run (scraped from the app logs)."""
+    if not _enabled:
+        return
+    session = _session.get()
+    record = {"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **fields,
+              "spans_ms": {k: round(v, 2) for k, v in (session.run() if session else {}).items()},
+              "counters": session.counters() if session else {},
+              "gauges": gauges()}
+    print(f"{LOG_PREFIX} {json.dumps(record, ensure_ascii=False, default=str)}", flush=True)
@@ -0,0 +1,155 @@
+"""Shared-vial purchase planning for an infusion center.
+
+``calculate_vials`` packs every dose on its own, so the rest of each opened
+100 / 120 mg Opdivo or 50 mg Yervoy vial is thrown away.  Where opened vials
+may be shared between the patients of one day, a day's purchase only has to
+cover the day's total mg.  That is the unbounded-knapsack covering problem
+``VialTable`` already solves for one dose (cheapest by more than 0.01 baht,
+then fewest vials), so:
+
+1. each patient's timeline (``SimulationCache.timeline``: the
+   ``run_simulation`` dates, skip-weekend shift included) gives the date and
+   dose of every administration - free PAP cycles still need vials;
+2. doses are summed per appointment date in one NumPy group-by;
+3. each distinct day composition (whole mg of Opdivo, whole mg of Yervoy) is
+   planned once from the shared vial tables and reused on every other day
+   with the same totals.
+
+Round-down patients contribute their reduced Yervoy target, as in
+``calculate_vials``.  Vials are priced at ``PRICES`` x ``multiplier``
+(default 1.0, the purchase price) and every day is compared with packing its
+doses one by one.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .timeline import O_COLUMNS, Y_COLUMNS
+from .vials import O_SIZES, ROUND_DOWN_ALLOWANCE, Y_SIZES, get_vial_table
+
+DAY_COLUMNS = ['date', 'patients', 'opdivo_mg', 'yervoy_mg', *O_COLUMNS, *Y_COLUMNS, 'pooled_cost', 'separate_cost',
+               'saved', 'opdivo_waste_mg', 'opdivo_waste_separate_mg', 'yervoy_waste_mg', 'yervoy_waste_separate_mg']
+
+
+@dataclass
+class PoolingPlan:
+    days: pd.DataFrame          # one row per appointment date, ``DAY_COLUMNS``
+    patients: int
+    doses: int
+    compositions: int           # distinct day compositions actually planned
+    rejected: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self):
+        d = self.days
+        separate, pooled = float(d['separate_cost'].sum()), float(d['pooled_cost'].sum())
+        return {'patients': self.patients, 'doses': self.doses, 'days': len(d), 'compositions': self.compositions,
+                'separate_cost': separate, 'pooled_cost': pooled, 'saved': separate - pooled,
+                'saved_pct': 100 * (separate - pooled) / separate if separate else 0.0,
+                **{c: float(d[c].sum()) for c in DAY_COLUMNS if c.endswith('_mg') and 'waste' in c}}
+
+    def line(self):
+        s = self.summary()
+        return (f"{s['patients']:,} patients, {s['doses']:,} doses on {s['days']:,} days: "
+                f"฿{s['separate_cost']:,.0f} -> ฿{s['pooled_cost']:,.0f} (saves ฿{s['saved']:,.0f}, {s['saved_pct']:.1f}%), "
+                f"Opdivo waste {s['opdivo_waste_separate_mg']:,.0f} -> {s['opdivo_waste_mg']:,.0f} mg, "
+                f"Yervoy waste {s['yervoy_waste_separate_mg']:,.0f} -> {s['yervoy_waste_mg']:,.0f} mg "
+                f"in {self.elapsed:.2f}s")
+
+
+def _whole_mg(mg):
+    """Vial-table rows of single doses, exactly as ``calculate_vials`` rounds them."""
+    return np.where(mg > 0, np.ceil(mg), 0).astype(np.int64)
+
+
+def _packed(table, sizes, rows):
+    """(cost, vial mg bought, counts per size) of each distinct whole-mg row."""
+    out = {}
+    for n in rows.tolist():
+        counts = table.breakdown(n)
+        out[n] = (table.cost(n), sum(s * c for s, c in counts.items()), [counts.get(s, 0) for s in sizes])
+    return out
+
+
+def collect_doses(jobs, cache=None):
+    """(dates, Opdivo mg, Yervoy mg, patients with a dose) over every administration of every ``quote`` job."""
+    if cache is None:
+        from .whatif import SimulationCache
+        cache = SimulationCache()
+    dates, o_mg, y_mg, patients = [], [], [], 0
+    for ident, spec, weight, stock, markup, start_dt, skip, sector, round_down in jobs:
+        tl = cache.timeline(spec, weight, stock, 1 + markup / 100, start_dt, skip, sector, round_down)[4]
+        if tl.is_empty:
+            continue
+        y_dose = spec.p1_y.mg(weight)
+        y_target = max(0, y_dose - ROUND_DOWN_ALLOWANCE) if round_down else y_dose
+        dates.append(tl.cols['date'])
+        o_mg.append(np.where(tl.cols['phase'] == 1, spec.p1_o.mg(weight), spec.p2_o.mg(weight)))
+        y_mg.append(np.where(tl.cols['yervoy_given'], y_target, 0.0))
+        patients += 1
+    if not dates:
+        return np.zeros(0, dtype="datetime64[D]"), np.zeros(0), np.zeros(0), 0
+    return np.concatenate(dates), np.concatenate(o_mg).astype(float), np.concatenate(y_mg).astype(float), patients
+
+
+def plan_pooling(jobs, stock=O_SIZES, multiplier=1.0, cache=None):
+    """Cheapest shared-vial purchase per appointment date for ``quote`` jobs (see ``quote.prepare_row``)."""
+    started = time.perf_counter()
+    dates, o_mg, y_mg, patients = collect_doses(jobs, cache)
+    given = (o_mg > 0) | (y_mg > 0)
+    dates, o_mg, y_mg = dates[given], o_mg[given], y_mg[given]
+    o_table, y_table = get_vial_table('O', stock, multiplier), get_vial_table('Y', [50], multiplier)
+    o_sizes = [s for s in O_SIZES if s in stock]
+
+    # every dose packed alone: one lookup per distinct whole mg
+    o_rows, y_rows = _whole_mg(o_mg), _whole_mg(y_mg)
+    o_alone, y_alone = _packed(o_table, o_sizes, np.unique(o_rows)), _packed(y_table, Y_SIZES, np.unique(y_rows))
+    sep_cost = np.array([o_alone[n][0] for n in o_rows.tolist()]) + np.array([y_alone[n][0] for n in y_rows.tolist()])
+    o_bought = np.array([o_alone[n][1] for n in o_rows.tolist()], dtype=float)
+    y_bought = np.array([y_alone[n][1] for n in y_rows.tolist()], dtype=float)
+
+    day, day_of = np.unique(dates, return_inverse=True)
+    per_day = lambda values: np.bincount(day_of, weights=values, minlength=len(day))
+    o_day, y_day = per_day(o_mg), per_day(y_mg)
+
+    # pooled: one plan per distinct (Opdivo mg, Yervoy mg) day composition
+    o_need, y_need = _whole_mg(np.round(o_day, 6)), _whole_mg(np.round(y_day, 6))    # 179.99999999 is 180 mg
+    plans = {}
+    for key in zip(o_need.tolist(), y_need.tolist()):
+        if key not in plans:
+            o_cost, o_buy, o_counts = _packed(o_table, o_sizes, np.array([key[0]]))[key[0]]
+            y_cost, y_buy, y_counts = _packed(y_table, Y_SIZES, np.array([key[1]]))[key[1]]
+            plans[key] = (o_cost + y_cost, o_buy, y_buy, o_counts, y_counts)
+    planned = [plans[key] for key in zip(o_need.tolist(), y_need.tolist())]
+
+    counts = {c: np.zeros(len(day), dtype=np.int64) for c in (*O_COLUMNS, *Y_COLUMNS)}
+    for i, (_, _, _, o_counts, y_counts) in enumerate(planned):
+        for s, c in zip(o_sizes, o_counts):
+            counts[f"o_{s}"][i] = c
+        counts[Y_COLUMNS[0]][i] = y_counts[0]
+    pooled = np.array([p[0] for p in planned])
+    separate = per_day(sep_cost)
+    days = pd.DataFrame({
+        'date': day, 'patients': np.bincount(day_of, minlength=len(day)), 'opdivo_mg': o_day, 'yervoy_mg': y_day,
+        **counts, 'pooled_cost': pooled, 'separate_cost': separate, 'saved': separate - pooled,
+        'opdivo_waste_mg': np.array([p[1] for p in planned], dtype=float) - o_day,
+        'opdivo_waste_separate_mg': per_day(o_bought) - o_day,
+        'yervoy_waste_mg': np.array([p[2] for p in planned], dtype=float) - y_day,
+        'yervoy_waste_separate_mg': per_day(y_bought) - y_day,
+    }, columns=DAY_COLUMNS)
+    mg = [c for c in DAY_COLUMNS if c.endswith('_mg')]
+    days[mg] = days[mg].round(6)      # summed float doses: 24913.599999999962 mg is 24913.6
+    return PoolingPlan(days, patients, int(len(dates)), len(plans), elapsed=time.perf_counter() - started)
+
+
+def pool_csv(src, index=None, stock=O_SIZES, multiplier=1.0):
+    """``plan_pooling`` for a ``quote``-style patient CSV; unreadable rows end up in ``rejected``."""
+    from .quote import RegimenIndex, prepare_chunk
+    df = pd.read_csv(src, dtype={'patient_id': str}, skipinitialspace=True)
+    df.columns = [c.strip().lower() for c in df.columns]
+    jobs, rejected = prepare_chunk(df, index or RegimenIndex())
+    plan = plan_pooling(jobs, stock, multiplier)
+    plan.rejected = rejected
+    return plan
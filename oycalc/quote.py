@@ -0,0 +1,331 @@
+"""Bulk quotations: price a CSV of patients without the Streamlit UI.
+
+The input is read in chunks of ``chunksize`` rows.  Each chunk is matched
+against the regimen sheet of its sector, priced in a worker process and
+written out as soon as it is done, in input order, so memory stays bounded by
+``chunksize`` x ``max_pending`` rows whatever the file size.
+
+Input columns (only ``weight`` and ``regimen`` are required)::
+
+    patient_id, indication, regimen, weight, sector, markup, start_date,
+    stock, skip_weekend, round_down
+
+``stock`` lists the Opdivo vial sizes on hand, e.g. ``"40;100;120"``.  A row
+that cannot be priced keeps its place in the output with ``error`` set.
+
+Output is CSV, or Parquet when the file name ends in ``.parquet``: one row per
+patient, plus optionally the full timeline (one row per cycle) to a second
+file, in the typed ``Timeline`` columns (vial counts per size, amounts in
+baht).  From the shell::
+
+    python -m oycalc quote patients.csv -o totals.parquet --timelines cycles.parquet
+"""
+import os
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .bands import get_price_index
+from .timeline import COLUMNS as TIMELINE_FIELDS, DTYPES as TIMELINE_DTYPES, Timeline
+from .vials import O_SIZES
+from .workers import process_pool
+
+DEFAULT_CHUNKSIZE = 2000
+SECTORS = ("Government", "Private")
+TOTAL_COLUMNS = ['row', 'patient_id', 'indication', 'regimen', 'sector', 'weight', 'markup', 'start_date',
+                 'total_paid', 'o_paid_rounds', 'p1_cycle_cost', 'p2_cycle_cost', 'cap_months', 'has_p2', 'error']
+TIMELINE_COLUMNS = ['row', 'patient_id'] + list(TIMELINE_FIELDS)
+# Parquet column types, fixed up front: a chunk without errors (or without
+# patient ids) must not type those columns as null for the rest of the file
+TOTAL_TYPES = dict(row='int64', patient_id='string', indication='string', regimen='string', sector='string',
+                   weight='double', markup='double', start_date='timestamp[ms]', total_paid='double',
+                   o_paid_rounds='double', p1_cycle_cost='double', p2_cycle_cost='double', cap_months='int64',
+                   has_p2='bool', error='string')
+_TIMELINE_SPECIAL = {'row': 'int64', 'patient_id': 'string', 'date': 'timestamp[ms]', 'phase': 'category',
+                     'status': 'category'}
+TIMELINE_TYPES = {c: _TIMELINE_SPECIAL.get(c) or np.dtype(TIMELINE_DTYPES[c]).name for c in TIMELINE_COLUMNS}
+_TRUE = {"1", "true", "yes", "y"}
+
+
+@dataclass
+class QuoteStats:
+    rows: int = 0
+    errors: int = 0
+    chunks: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def line(self):
+        return f"{self.rows:,} rows ({self.errors:,} errors) in {self.elapsed:.1f}s - {self.rate:,.0f} rows/s"
+
+
+def _parse_stock(val):
+    if isinstance(val, (list, tuple)):     # JSON requests may send [40, 100]
+        val = ";".join(str(v) for v in val)
+    if val is None or pd.isna(val) or str(val).strip() == "":
+        return O_SIZES
+    sizes = tuple(sorted({int(float(s)) for s in re.split(r"[;,/ |]+", str(val).strip()) if s}))
+    if not sizes or any(s not in O_SIZES for s in sizes):
+        raise ValueError(f"stock {val!r}: sizes must be among {list(O_SIZES)}")
+    return sizes
+
+
+def _flag(val, default):
+    if pd.isna(val) or str(val).strip() == "":
+        return default
+    return str(val).strip().lower() in _TRUE
+
+
+def _sector(val):
+    name = "Government" if pd.isna(val) or str(val).strip() == "" else str(val).strip().title()
+    if name not in SECTORS:
+        raise ValueError(f"unknown sector {val!r}")
+    return name
+
+
+class RegimenIndex:
+    """(sector, indication, regimen name) -> RegimenSpec, loaded per sector on first use.
+
+    Rebuilt for a sector whenever the store hands out a new snapshot, so a
+    long-running service follows sheet updates.
+    """
+
+    def __init__(self, store=None):
+        if store is None:
+            from .datasource import store_from_env
+            store = store_from_env()
+        self.store = store
+        self._by_sector = {}
+
+    def _specs(self, sector):
+        data = self.store.get(sector)
+        cached = self._by_sector.get(sector)
+        if cached is None or cached[0] is not data:
+            by_name, by_pair = {}, {}
+            for i, spec in data.specs.items():
+                ind = str(data.df.at[i, 'Indication_Group']).strip()
+                by_pair[(ind, spec.name.strip())] = spec
+                by_name.setdefault(spec.name.strip(), []).append(spec)
+            cached = self._by_sector[sector] = (data, by_pair, by_name)
+        return cached[1:]
+
+    def preload(self, sectors=SECTORS):
+        for sector in sectors:
+            self._specs(sector)
+
+    def find(self, sector, indication, regimen):
+        by_pair, by_name = self._specs(sector)
+        name = str(regimen).strip()
+        if indication is not None and not pd.isna(indication) and str(indication).strip():
+            spec = by_pair.get((str(indication).strip(), name))
+            if spec is None:
+                raise ValueError(f"{sector}: no regimen {name!r} under {indication!r}")
+            return spec
+        matches = by_name.get(name, [])
+        if len(matches) != 1:
+            raise ValueError(f"{sector}: regimen {name!r} " + ("not found" if not matches else "is ambiguous, give indication"))
+        return matches[0]
+
+
+def prepare_chunk(chunk, index, first_row=0):
+    """Resolve each input row into the arguments of one simulation.
+
+    Returns ``(jobs, rejected)``: ``jobs`` are picklable tuples for
+    ``price_jobs``; ``rejected`` are finished total rows for inputs that could
+    not be read.
+    """
+    today = date.today()
+    jobs, rejected = [], []
+    for k, r in enumerate(chunk.to_dict("records")):
+        job, reject = prepare_row(r, index, first_row + k, today)
+        if job is None:
+            rejected.append(reject)
+        else:
+            jobs.append(job)
+    return jobs, rejected
+
+
+def prepare_row(r, index, row_no=0, today=None):
+    """One input record (lower-case keys, any may be missing) -> ``(job, None)`` or ``(None, rejected)``."""
+    get = r.get
+    ident = {'row': row_no, 'patient_id': get('patient_id'), 'indication': get('indication'), 'regimen': get('regimen')}
+    try:
+        sector = _sector(get('sector'))
+        ident['sector'] = sector
+        weight = float(get('weight'))
+        if not weight > 0:
+            raise ValueError(f"weight {get('weight')!r} must be positive")
+        markup = get('markup')
+        markup = 0.0 if markup is None or pd.isna(markup) else float(markup)
+        start = get('start_date')
+        start_dt = (today or date.today()) if start is None or pd.isna(start) else pd.Timestamp(start).date()
+        spec = index.find(sector, ident['indication'], ident['regimen'])
+        return (ident, spec, weight, _parse_stock(get('stock')), markup, start_dt,
+                _flag(get('skip_weekend'), True), sector, _flag(get('round_down'), False)), None
+    except (TypeError, ValueError, KeyError) as e:
+        return None, dict(ident, error=str(e))
+
+
+_cache = None
+
+
+def price_jobs(jobs, timelines=False):
+    """Run one chunk of jobs (in a worker).  Returns (total rows, timeline frame or None)."""
+    global _cache
+    if _cache is None:
+        from .whatif import SimulationCache
+        _cache = SimulationCache()
+    totals, timeline, owners = [], [], []
+    for ident, spec, weight, stock, markup, start_dt, skip, sector, round_down in jobs:
+        try:
+            if timelines:
+                total, o_rounds, p1_c, p2_c, tl, cap, has_p2 = _cache.timeline(
+                    spec, weight, stock, 1 + markup / 100, start_dt, skip, sector, round_down)
+            else:
+                index = get_price_index(spec, stock, 1 + markup / 100, sector, round_down)
+                total, o_rounds, p1_c, p2_c, cap, has_p2 = index.totals(weight)
+        except Exception as e:   # one bad row must not lose the rest of the chunk
+            totals.append(dict(ident, weight=weight, markup=markup, start_date=start_dt, error=f"simulation failed: {e}"))
+            continue
+        totals.append(dict(ident, weight=weight, markup=markup, start_date=start_dt, total_paid=total,
+                           o_paid_rounds=o_rounds, p1_cycle_cost=p1_c, p2_cycle_cost=p2_c,
+                           cap_months=cap, has_p2=has_p2, error=None))
+        if timelines and len(tl):
+            timeline.append(tl)
+            owners.append(ident)
+    if not timeline:
+        return totals, None
+    # one frame per chunk: concatenating the typed columns is far cheaper than a frame per patient
+    df = Timeline.concat(timeline).frame
+    counts = [len(t) for t in timeline]
+    df.insert(0, 'patient_id', np.repeat(np.array([o['patient_id'] for o in owners], dtype=object), counts))
+    df.insert(0, 'row', np.repeat([o['row'] for o in owners], counts))
+    return totals, df
+
+
+def _totals_frame(records):
+    df = pd.DataFrame.from_records(records).reindex(columns=TOTAL_COLUMNS)
+    df = df.sort_values('row', kind='stable').reset_index(drop=True)
+    for c in ('patient_id', 'indication', 'regimen', 'sector', 'error'):
+        df[c] = df[c].astype(object).where(df[c].notna(), None).map(lambda v: v if v is None else str(v))
+    for c in ('weight', 'markup', 'total_paid', 'o_paid_rounds', 'p1_cycle_cost', 'p2_cycle_cost'):
+        df[c] = df[c].astype(float)
+    df['start_date'] = pd.to_datetime(df['start_date'])
+    df['cap_months'] = df['cap_months'].astype('Int64')
+    df['has_p2'] = df['has_p2'].astype('boolean')
+    return df
+
+
+def _timeline_frame(df):
+    df = df.reindex(columns=TIMELINE_COLUMNS)
+    df['patient_id'] = df['patient_id'].map(lambda v: None if v is None or pd.isna(v) else str(v)).astype(object)
+    return df
+
+
+def arrow_schema(types):
+    """pyarrow schema from ``{column: type alias}``; ``'category'`` is a dictionary of strings."""
+    import pyarrow as pa
+    return pa.schema([(c, pa.dictionary(pa.int8(), pa.string()) if t == 'category' else pa.type_for_alias(t))
+                      for c, t in types.items()])
+
+
+class ChunkWriter:
+    """Appends DataFrames to one CSV or Parquet file (chosen by extension).
+
+    ``types`` (``{column: type alias}``) fixes the Parquet schema; without it
+    the schema is taken from the first frame written.
+    """
+
+    def __init__(self, path, types=None):
+        self.path = path
+        self.parquet = str(path).lower().endswith(".parquet")
+        self.types = types
+        self._writer = None
+        self._started = False
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                schema = arrow_schema(self.types) if self.types else pa.Table.from_pandas(df, preserve_index=False).schema
+                self._writer = pq.ParquetWriter(self.path, schema)
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif not self._started and not self.parquet:
+            open(self.path, "w").close()
+
+
+def print_progress(stats):
+    print(f"⏳ quote: {stats.rows:,} rows, {stats.rate:,.0f} rows/s, {stats.errors:,} errors, "
+          f"{stats.chunks} chunks", file=sys.stderr, flush=True)
+
+
+def quote_csv(src, out, timelines_out=None, index=None, chunksize=DEFAULT_CHUNKSIZE, workers=None,
+              max_pending=None, progress=print_progress):
+    """Price every row of ``src`` into ``out`` (and ``timelines_out``).  Returns ``QuoteStats``.
+
+    ``workers=0`` prices in this process.  At most ``max_pending`` chunks
+    (default ``2 x workers``) are in flight; reading waits for the oldest one
+    to be written.
+    """
+    index = index or RegimenIndex()
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    max_pending = max_pending or max(2 * workers, 1)
+    totals_w = ChunkWriter(out, TOTAL_TYPES)
+    timeline_w = ChunkWriter(timelines_out, TIMELINE_TYPES) if timelines_out else None
+    stats = QuoteStats()
+    pool = process_pool(workers) if workers else None
+    pending = deque()
+
+    def drain(limit):
+        while len(pending) > limit:
+            rejected, result = pending.popleft()
+            totals, timeline = result.result() if pool else result
+            totals_w.write(_totals_frame(totals + rejected))
+            if timeline_w is not None and timeline is not None:
+                timeline_w.write(_timeline_frame(timeline))
+            stats.rows += len(totals) + len(rejected)
+            stats.errors += len(rejected) + sum(t['error'] is not None for t in totals)
+            stats.chunks += 1
+            stats.elapsed = time.perf_counter() - stats.started
+            if progress:
+                progress(stats)
+
+    try:
+        reader = pd.read_csv(src, chunksize=chunksize, dtype={'patient_id': str}, skipinitialspace=True)
+        first_row = 0
+        for chunk in reader:
+            chunk.columns = [c.strip().lower() for c in chunk.columns]
+            jobs, rejected = prepare_chunk(chunk, index, first_row)
+            first_row += len(chunk)
+            want = timeline_w is not None
+            pending.append((rejected, pool.submit(price_jobs, jobs, want) if pool else price_jobs(jobs, want)))
+            drain(max_pending)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        totals_w.close()
+        if timeline_w is not None:
+            timeline_w.close()
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
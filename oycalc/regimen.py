@@ -0,0 +1,85 @@
+"""Regimen sheet rows parsed once into typed, immutable specs."""
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+
+BLANK = ['', '-', 'nan']
+
+
+def get_val(val):
+    if pd.isna(val) or str(val).strip() in BLANK: return 0.0
+    s = str(val).replace(',', '').strip()
+    match = re.search(r"(\d+(\.\d+)?)", s)
+    return float(match.group(1)) if match else 0.0
+
+
+def _is_malformed(val):
+    """Filled-in cell with no number in it (``get_val`` would quietly give 0.0)."""
+    if pd.isna(val) or str(val).strip() in BLANK: return False
+    return re.search(r"\d", str(val)) is None
+
+
+@dataclass(frozen=True)
+class Dose:
+    amount: float
+    per_kg: bool
+
+    @classmethod
+    def parse(cls, val):
+        raw = str(val)
+        return cls(get_val(raw), 'mg/kg' in raw.lower())
+
+    def mg(self, weight):
+        return self.amount * (weight if self.per_kg else 1)
+
+
+@dataclass(frozen=True)
+class RegimenSpec:
+    indication: str
+    name: str
+    p1_o: Dose
+    p1_o_freq: int
+    p1_y: Dose
+    p1_y_freq: int
+    p1_cycle_limit: int
+    p2_o: Dose
+    p2_freq: int
+    cap_months: int
+    has_p2: bool
+
+    @classmethod
+    def from_row(cls, row, issues=None):
+        """Parse one sheet row; unreadable cells are appended to ``issues``."""
+        def cell(key, *default):
+            val = row.get(key, *default)
+            if issues is not None and _is_malformed(val):
+                issues.append(f"{row.get('Regimen_Name', '?')}: {key} = {val!r} is not a number, using 0")
+            return val
+
+        p1_o_freq = max(1, int(get_val(cell('P1_O_Freq_Weeks', 2))))
+        return cls(
+            indication=str(row.get('Indication_Group', '')),
+            name=str(row.get('Regimen_Name', '')),
+            p1_o=Dose.parse(cell('P1_O_Dose')),
+            p1_o_freq=p1_o_freq,
+            p1_y=Dose.parse(cell('P1_Y_Dose', '0')),
+            p1_y_freq=max(1, int(get_val(cell('P1_Y_Freq_Weeks', p1_o_freq)))),
+            p1_cycle_limit=int(get_val(cell('P1_Cycle_Limit'))),
+            p2_o=Dose.parse(cell('P2_O_Dose')),
+            p2_freq=max(1, int(get_val(cell('P2_Freq_Weeks')))),
+            cap_months=int(get_val(cell('PAP_Cap_Months', 10))),
+            has_p2=pd.notna(row.get('P2_O_Dose')) and str(row.get('P2_O_Dose', '-')).strip() not in ['', '-', '0'],
+        )
+
+
+def as_spec(regimen):
+    """Accept either a ``RegimenSpec`` or a raw sheet row."""
+    return regimen if isinstance(regimen, RegimenSpec) else RegimenSpec.from_row(regimen)
+
+
+def parse_regimens(df):
+    """Specs for every row of a sheet tab, indexed like ``df``, plus parse issues."""
+    issues = []
+    specs = pd.Series([RegimenSpec.from_row(row, issues) for _, row in df.iterrows()], index=df.index, dtype=object)
+    return specs, issues
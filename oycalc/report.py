@@ -0,0 +1,288 @@
+"""Summary report rendering: header block + timeline table.
+
+``build_report`` turns a simulation result into plain strings once; the
+renderers only lay them out:
+
+* ``render_png`` - drawn directly with Pillow on a canvas sized up front,
+* ``render_svg`` / ``render_pdf`` - vector output, the PDF split into pages
+  of ``rows_per_page`` for long Phase 2 timelines,
+* ``render_png_matplotlib`` - the original matplotlib table, kept as a
+  fallback and as the benchmark baseline.
+"""
+import io
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+RULE = "-" * 100
+COLUMNS = ["Phase", "Cycle", "Date (DD/MM/YY)", "Month", "Opdivo Vials", "Yervoy Vials",
+           "Opdivo (THB)", "Yervoy (THB)", "Total (THB)"]
+COL_WEIGHTS = [1.0, 0.7, 1.4, 0.7, 1.4, 1.2, 1.2, 1.2, 1.2]
+
+DEEP_BLUE = "#004080"
+EDGE = "#DDDDDD"
+FREE_BG, FREE_FG = "#F9F9F9", "#888888"
+ALT_BG = "#F2F5F8"
+
+
+@dataclass(frozen=True)
+class Report:
+    header: tuple       # lines of the monospace summary block
+    rows: tuple         # table rows (strings, vial cells may hold "\n")
+    free: tuple         # True where the row is a free cycle
+
+
+def build_report(ind, reg, weight, markup, sector, p1, p2, total, rounds, timeline, cap_limit):
+    """``timeline`` is the ``Timeline`` shown on screen; its cached display strings are reused."""
+    header = (
+        f"O+Y Treatment Expense Summary | Sector: {sector}",
+        RULE,
+        f"Indication: {ind}",
+        f"Regimen:    {reg}",
+        f"Weight:     {weight} kg  |  Hospital Markup: {markup}%",
+        f"PAP Policy: Capped at {cap_limit} months",
+        "",
+        f"Cost per Cycle (Phase 1): {p1:,.0f} THB",
+        f"Cost per Cycle (Phase 2): {p2:,.0f} THB",
+        RULE,
+        f"Summary - Patient Paid Rounds: {rounds:.1f} Cycles (Opdivo)",
+        f"Estimated Total Investment:     {total:,.0f} THB",
+    )
+    if timeline.is_empty:
+        return Report(header, (), ())
+    shown = timeline.cols['month'] <= (cap_limit + 1)
+    text = timeline.display[shown]
+    rows = tuple(zip(
+        text['Phase'], text['Cycle'].astype(str),
+        [d.strftime("%d/%m/%Y") for d in timeline.cols['date'][shown].astype(object)],
+        text['Month'].astype(str),
+        [v.replace(', ', '\n') for v in text['Opdivo Vials']], [v.replace(', ', '\n') for v in text['Yervoy Vials']],
+        *([f"{v:,.0f}" for v in text[c].tolist()] for c in ('Opdivo (฿)', 'Yervoy (฿)', 'Total (฿)')),
+    ))
+    free = tuple(timeline.free[shown].tolist())
+    return Report(header, rows, free)
+
+
+def _row_style(i, free):
+    """(background, text colour, bold) for table row ``i`` (0 = column header)."""
+    if i == 0:
+        return DEEP_BLUE, "#FFFFFF", True
+    if free:
+        return FREE_BG, FREE_FG, False
+    return ("#FFFFFF" if i % 2 != 0 else ALT_BG), "#000000", False
+
+
+def _col_edges(left, width):
+    total = sum(COL_WEIGHTS)
+    edges, x = [left], left
+    for w in COL_WEIGHTS:
+        x += width * w / total
+        edges.append(x)
+    return edges
+
+
+# ---------- PNG (Pillow) ----------
+_FONT_FILES = {
+    (False, False): ["DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"],
+    (True, False): ["DejaVuSans-Bold.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf"],
+    (False, True): ["DejaVuSansMono.ttf", "Courier New.ttf", "LiberationMono-Regular.ttf"],
+}
+_FONT_DIRS = ["/usr/share/fonts/truetype/dejavu", "/usr/share/fonts/dejavu", "/usr/share/fonts/TTF",
+              "/usr/share/fonts/truetype/liberation", "/Library/Fonts", "C:/Windows/Fonts"]
+
+
+def _font_dirs():
+    dirs = [os.environ["OYCALC_FONT_DIR"]] if os.environ.get("OYCALC_FONT_DIR") else []
+    dirs += _FONT_DIRS
+    # matplotlib ships DejaVu; locate it without importing matplotlib
+    import importlib.util
+    spec = importlib.util.find_spec("matplotlib")
+    if spec and spec.origin:
+        dirs.append(os.path.join(os.path.dirname(spec.origin), "mpl-data", "fonts", "ttf"))
+    return dirs
+
+
+@lru_cache(maxsize=16)
+def get_font(size, bold=False, mono=False):
+    from PIL import ImageFont
+    for d in _font_dirs():
+        for name in _FONT_FILES[(bold and not mono, mono)]:
+            path = os.path.join(d, name)
+            if os.path.exists(path):
+                return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def render_png(report, width=2000, scale=1.0):
+    from PIL import Image, ImageDraw
+
+    body, mono = get_font(round(20 * scale)), get_font(round(22 * scale), mono=True)
+    bold = get_font(round(20 * scale), bold=True)
+    pad = round(60 * scale)
+    header_lh = round(22 * scale * 1.4)
+    text_lh = round(20 * scale * 1.25)
+    base_row_h = round(50 * scale)
+
+    table = [tuple(COLUMNS)] + list(report.rows)
+    row_h = [max(base_row_h, max(c.count("\n") + 1 for c in r) * text_lh + round(16 * scale)) for r in table]
+    table_top = pad + header_lh * len(report.header) + pad // 2
+    height = table_top + sum(row_h) + pad
+
+    img = Image.new("RGB", (width, height), "white")    # the only allocation; sized from the rows
+    draw = ImageDraw.Draw(img)
+    draw.multiline_text((pad, pad), "\n".join(report.header), font=mono, fill="black", spacing=header_lh - mono.size)
+
+    edges = _col_edges(pad // 2, width - pad)
+    y = table_top
+    for i, (cells, h) in enumerate(zip(table, row_h)):
+        bg, fg, is_bold = _row_style(i, i > 0 and report.free[i - 1])
+        draw.rectangle([edges[0], y, edges[-1], y + h], fill=bg)
+        for j, text in enumerate(cells):
+            cx = (edges[j] + edges[j + 1]) / 2
+            draw.multiline_text((cx, y + h / 2), str(text), font=bold if is_bold else body, fill=fg,
+                                anchor="mm", align="center", spacing=text_lh - body.size)
+        for x in edges:
+            draw.line([x, y, x, y + h], fill=EDGE)
+        draw.line([edges[0], y, edges[-1], y], fill=EDGE)
+        y += h
+    draw.line([edges[0], y, edges[-1], y], fill=EDGE)
+
+    buf = io.BytesIO(); img.save(buf, format="PNG", compress_level=1); buf.seek(0)
+    return buf
+
+
+# ---------- SVG ----------
+def _xml(s):
+    return str(s).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_svg(report, width=1200):
+    fs, lh, pad, base_row_h = 12, 15, 36, 30
+    table = [tuple(COLUMNS)] + list(report.rows)
+    row_h = [max(base_row_h, max(c.count("\n") + 1 for c in r) * lh + 10) for r in table]
+    table_top = pad + 18 * len(report.header) + pad // 2
+    height = table_top + sum(row_h) + pad
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+           f'<rect width="{width}" height="{height}" fill="white"/>',
+           f'<text x="{pad}" y="{pad}" font-family="DejaVu Sans Mono, Courier New, monospace" font-size="13" xml:space="preserve">']
+    for k, line in enumerate(report.header):
+        out.append(f'<tspan x="{pad}" dy="{0 if k == 0 else 18}">{_xml(line)}</tspan>')
+    out.append('</text>')
+
+    edges = _col_edges(pad // 2, width - pad)
+    y = table_top
+    for i, (cells, h) in enumerate(zip(table, row_h)):
+        bg, fg, is_bold = _row_style(i, i > 0 and report.free[i - 1])
+        out.append(f'<rect x="{edges[0]:.1f}" y="{y}" width="{edges[-1] - edges[0]:.1f}" height="{h}" fill="{bg}" stroke="{EDGE}"/>')
+        weight = ' font-weight="bold"' if is_bold else ''
+        for j, text in enumerate(cells):
+            lines = str(text).split("\n")
+            cx, top = (edges[j] + edges[j + 1]) / 2, y + h / 2 - (len(lines) - 1) * lh / 2 + fs / 3
+            out.append(f'<text x="{cx:.1f}" y="{top:.1f}" text-anchor="middle" font-family="DejaVu Sans, Arial, sans-serif" '
+                       f'font-size="{fs}" fill="{fg}"{weight}>'
+                       + "".join(f'<tspan x="{cx:.1f}" dy="{0 if k == 0 else lh}">{_xml(t)}</tspan>' for k, t in enumerate(lines))
+                       + '</text>')
+            if j:
+                out.append(f'<line x1="{edges[j]:.1f}" y1="{y}" x2="{edges[j]:.1f}" y2="{y + h}" stroke="{EDGE}"/>')
+        y += h
+    out.append('</svg>')
+    return io.BytesIO("\n".join(out).encode("utf-8"))
+
+
+# ---------- PDF (hand-written, base-14 Courier so widths are exact) ----------
+PAGE_W, PAGE_H = 842, 595          # A4 landscape, points
+COURIER_EM = 0.6
+
+
+def _pdf_str(s):
+    s = str(s).encode("latin-1", "replace").decode("latin-1")
+    return "(" + s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def _rgb(hex_color):
+    h = hex_color.lstrip("#")
+    return " ".join(f"{int(h[k:k + 2], 16) / 255:.3f}" for k in (0, 2, 4))
+
+
+def render_pdf(report, rows_per_page=22):
+    """Vector PDF; the header goes on page 1 and the table repeats its column row on every page."""
+    margin, fs, lh, base_row_h, header_fs = 28, 8, 10, 20, 9
+    edges = _col_edges(margin, PAGE_W - 2 * margin)
+    chunks = [report.rows[k:k + rows_per_page] for k in range(0, len(report.rows), rows_per_page)] or [()]
+    free_chunks = [report.free[k:k + rows_per_page] for k in range(0, len(report.free), rows_per_page)] or [()]
+
+    pages = []
+    for p, (rows, free) in enumerate(zip(chunks, free_chunks)):
+        ops, y = [], PAGE_H - margin
+        if p == 0:
+            ops.append(f"BT /F1 {header_fs} Tf {header_fs + 3} TL {margin} {y - header_fs} Td")
+            ops += [f"{_pdf_str(line)} Tj T*" for line in report.header]
+            ops.append("ET")
+            y -= (header_fs + 3) * len(report.header) + 12
+        for i, cells in enumerate([tuple(COLUMNS)] + list(rows)):
+            bg, fg, is_bold = _row_style(0 if i == 0 else p * rows_per_page + i, i > 0 and free[i - 1])
+            h = max(base_row_h, max(c.count("\n") + 1 for c in cells) * lh + 6)
+            y -= h
+            ops.append(f"{_rgb(bg)} rg {_rgb(EDGE)} RG 0.5 w {edges[0]:.2f} {y:.2f} {edges[-1] - edges[0]:.2f} {h} re B")
+            for x in edges[1:-1]:
+                ops.append(f"{x:.2f} {y:.2f} m {x:.2f} {y + h:.2f} l S")
+            font = "/F2" if is_bold else "/F1"
+            ops.append(f"{_rgb(fg)} rg")
+            for j, text in enumerate(cells):
+                lines = str(text).split("\n")
+                cx = (edges[j] + edges[j + 1]) / 2
+                top = y + h / 2 + (len(lines) - 1) * lh / 2 - fs / 3
+                for k, line in enumerate(lines):
+                    tx = cx - len(line) * fs * COURIER_EM / 2
+                    ops.append(f"BT {font} {fs} Tf {tx:.2f} {top - k * lh:.2f} Td {_pdf_str(line)} Tj ET")
+        pages.append("\n".join(ops).encode("latin-1"))
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for content in pages:
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                        "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>"
+                        % (PAGE_W, PAGE_H, len(objects))).encode())
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out, offsets = io.BytesIO(), []
+    out.write(b"%PDF-1.4\n")
+    for n, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % n + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % o for o in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    out.seek(0)
+    return out
+
+
+# ---------- original matplotlib table ----------
+def render_png_matplotlib(report):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    num_rows = len(report.rows) + 1
+    height = 5.0 + (num_rows * 0.5)
+    fig, ax = plt.subplots(figsize=(15, height))
+    ax.axis('off')
+    ax.text(0.05, 0.98, "\n".join(report.header) + "\n", transform=ax.transAxes, fontsize=11, va='top', ha='left',
+            family='monospace', linespacing=1.4)
+    table_height = (num_rows * 0.5) / height
+    the_table = ax.table(cellText=[COLUMNS] + [list(r) for r in report.rows], loc='bottom',
+                         bbox=[0.02, 0.05, 0.96, table_height], cellLoc='center')
+    the_table.auto_set_font_size(False); the_table.set_fontsize(10); the_table.scale(1, 2.0)
+    for (i, j), cell in the_table.get_celld().items():
+        cell.set_edgecolor(EDGE)
+        if i == 0: cell.set_facecolor(DEEP_BLUE); cell.set_text_props(color='white', weight='bold')
+        elif report.free[i - 1]: cell.set_facecolor(FREE_BG); cell.set_text_props(color=FREE_FG)
+        else: cell.set_facecolor('white' if i % 2 != 0 else ALT_BG)
+
+    buf = io.BytesIO(); plt.savefig(buf, format='png', bbox_inches='tight', dpi=150); buf.seek(0); plt.close(fig)
+    return buf
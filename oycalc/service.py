@@ -0,0 +1,305 @@
+"""Local HTTP JSON quotation service for partner systems.
+
+    python -m oycalc serve --port 8765
+
+Built on ``asyncio`` alone (no web framework).  Routes:
+
+=====================  ===================================================
+``POST /quote``        one quote: the fields of a ``quote`` CSV row as JSON
+                       (``stock`` may be a list), plus ``"timeline": true``
+                       for the cycle-by-cycle table
+``POST /quote/batch``  ``{"quotes": [...], "timeline": false}`` - results
+                       come back in order, a bad item only fails itself
+``GET /stats``         latency percentiles, throughput, queue and coalescing
+``GET /health``        liveness
+=====================  ===================================================
+
+Pricing runs in a process pool (``workers=0``: one thread in this process).
+Identical quotes that are already in flight are not priced again: later
+requests await the same future.  New quotes from all requests parsed in one
+event-loop iteration go to the pool together, in tasks of ``TASK_SIZE``.  At most ``max_queue`` quotes may wait for
+the pool; past that a request is answered ``503`` with ``Retry-After``
+straight away instead of queueing without bound.
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from . import instrument
+from .quote import RegimenIndex, prepare_row, price_jobs
+from .workers import process_pool
+
+DEFAULT_PORT = 8765
+MAX_BATCH = 1000
+MAX_BODY = 4 * 1024 * 1024
+TASK_SIZE = 250                 # quotes per pool task
+RATE_WINDOW = 10.0              # seconds of history for the throughput figures
+PRICED = ('total_paid', 'o_paid_rounds', 'p1_cycle_cost', 'p2_cycle_cost', 'cap_months', 'has_p2', 'error')
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large", 422: "Unprocessable Entity",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status, self.headers = status, headers or {}
+
+
+def _json_value(v):
+    if hasattr(v, 'item'):          # NumPy scalars
+        v = v.item()
+    return v.isoformat() if isinstance(v, date) else v
+
+
+def price_unique(jobs, timelines):
+    """Worker: priced fields (and timeline rows) for each job, in order."""
+    totals, frame = price_jobs([(dict(job[0], row=k),) + tuple(job[1:]) for k, job in enumerate(jobs)], timelines)
+    out = [{c: _json_value(t.get(c)) for c in PRICED} for t in totals]
+    if frame is not None:
+        frame = frame.drop(columns=['patient_id'])
+        frame['date'] = frame['date'].dt.strftime("%Y-%m-%d")
+        for k, rows in frame.groupby('row', sort=False):
+            out[k]['timeline'] = [{c: _json_value(v) for c, v in r.items() if c != 'row'}
+                                  for r in rows.to_dict("records")]
+    if timelines:
+        for res in out:
+            res.setdefault('timeline', [])
+    return out
+
+
+class ServiceStats:
+    """Per-route latency (rolling percentiles) and recent throughput."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.latency = instrument.Recorder(window=2000, track_run=False)    # windows only: one add per request, forever
+        self._recent = deque()          # (finished at, quotes)
+
+    def record(self, route, status, ms, quotes):
+        self.latency.add(route, ms)
+        self.latency.incr("requests")
+        self.latency.incr(f"status.{status}")
+        self.latency.incr("quotes", quotes)
+        now = time.time()
+        self._recent.append((now, quotes))
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    def snapshot(self):
+        now = time.time()
+        recent = [q for t, q in self._recent if t >= now - RATE_WINDOW]
+        window = min(RATE_WINDOW, max(now - self.started, 1e-9))
+        return {"uptime_s": round(now - self.started, 1), "counters": self.latency.counters(),
+                "requests_per_s": round(len(recent) / window, 1), "quotes_per_s": round(sum(recent) / window, 1),
+                "latency_ms": {name: {k: round(v, 3) for k, v in s.items()}
+                               for name, s in self.latency.summary().items()}}
+
+
+class QuoteService:
+    """The HTTP handlers plus in-flight coalescing and the bounded worker queue; ``serve()`` runs it."""
+
+    def __init__(self, index=None, workers=None, max_queue=4096):
+        self.index = index or RegimenIndex()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue
+        self.stats = ServiceStats()
+        self.queued = 0                 # quotes submitted to the pool and not finished
+        self._inflight = {}             # pricing key -> asyncio.Future
+        self._pending = []              # new quotes not yet handed to the pool
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            if self.workers:
+                self._pool = process_pool(self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(1, thread_name_prefix="quote")
+        return self._pool
+
+    # ---------- pricing ----------
+    async def quote_many(self, records, timelines=False):
+        """Results for ``records`` in order; identical in-flight quotes are priced once."""
+        loop = asyncio.get_running_loop()
+        today = date.today()
+        results, waits, new = [None] * len(records), [], {}
+        for k, r in enumerate(records):
+            if not isinstance(r, dict):
+                results[k] = {"error": "quote must be a JSON object"}
+                continue
+            r = {str(key).lower(): v for key, v in r.items()}
+            job, rejected = prepare_row(r, self.index, k, today)
+            if job is None:
+                del rejected['row']
+                results[k] = rejected
+                continue
+            del job[0]['row']
+            key = tuple(job[1:]) + (bool(r.get('timeline', timelines)),)
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats.latency.incr("coalesced")
+            elif key in new:
+                fut = new[key][0]
+            else:
+                fut = loop.create_future()
+                fut.add_done_callback(lambda f: f.cancelled() or f.exception())    # nobody left waiting is fine
+                new[key] = (fut, job)
+            waits.append((k, job, fut))
+
+        if new:
+            if self.queued and self.queued + len(new) > self.max_queue:     # an idle service takes any batch
+                self.stats.latency.incr("rejected")
+                for fut, _ in new.values():
+                    fut.cancel()
+                raise HttpError(503, f"busy: {self.queued} quotes queued (limit {self.max_queue})", {"Retry-After": "1"})
+            for key, (fut, job) in new.items():
+                self._inflight[key] = fut
+                self._pending.append((key, fut, job))
+            self.queued += len(new)
+            if len(self._pending) == len(new):
+                loop.call_soon(self._flush)
+
+        for k, (ident, spec, weight, stock, markup, start_dt, *_), fut in waits:
+            results[k] = dict(ident, weight=weight, markup=markup, start_date=start_dt.isoformat(), **await fut)
+        return results
+
+    def _flush(self):
+        """Send the quotes queued during this loop iteration to the pool, ``TASK_SIZE`` per task."""
+        pending, self._pending = self._pending, []
+        for flag in (False, True):
+            items = [item for item in pending if item[0][-1] == flag]
+            for i in range(0, len(items), TASK_SIZE):
+                asyncio.ensure_future(self._run(items[i:i + TASK_SIZE], flag))
+
+    async def _run(self, items, timelines):
+        loop = asyncio.get_running_loop()
+        try:
+            with instrument.span("service.pool_task"):
+                priced = await loop.run_in_executor(self._executor(), price_unique, [job for _, _, job in items], timelines)
+            for (_, fut, _), res in zip(items, priced):
+                if not fut.done():
+                    fut.set_result(res)
+        except Exception as e:      # e.g. a broken pool: fail these quotes, keep serving
+            for _, fut, _ in items:
+                if not fut.done():
+                    fut.set_exception(HttpError(500, f"pricing failed: {e}"))
+        finally:
+            self.queued -= len(items)
+            for key, fut, _ in items:
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+
+    # ---------- HTTP ----------
+    async def dispatch(self, method, path, body):
+        """-> (status, JSON-able payload, extra headers)."""
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/health":
+            return 200, {"status": "ok"}, {}
+        if path == "/stats":
+            return 200, dict(self.stats.snapshot(), queued=self.queued, max_queue=self.max_queue,
+                             inflight=len(self._inflight), workers=self.workers), {}
+        if path not in ("/quote", "/quote/batch"):
+            raise HttpError(404, f"no route {path}")
+        if method != "POST":
+            raise HttpError(405, f"{path} takes POST", {"Allow": "POST"})
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError as e:
+            raise HttpError(400, f"invalid JSON: {e}")
+        if path == "/quote":
+            if not isinstance(payload, dict):
+                raise HttpError(400, "expected a JSON object")
+            result = (await self.quote_many([payload]))[0]
+            return (422 if result.get("error") else 200), result, {}
+        quotes = payload.get("quotes") if isinstance(payload, dict) else None
+        if not isinstance(quotes, list):
+            raise HttpError(400, 'expected {"quotes": [...]}')
+        if len(quotes) > MAX_BATCH:
+            raise HttpError(413, f"at most {MAX_BATCH} quotes per batch")
+        return 200, {"results": await self.quote_many(quotes, bool(payload.get("timeline", False)))}, {}
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive, Content-Length bodies only."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                t0 = time.perf_counter()
+                keep_alive, status, headers, route = False, 500, {}, "unknown"
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                    route = f"{method.upper()} {path.split('?', 1)[0].rstrip('/') or '/'}"
+                    fields = {}
+                    while True:
+                        h = await reader.readline()
+                        if h in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = h.decode("latin-1").partition(":")
+                        fields[name.strip().lower()] = value.strip()
+                    conn = fields.get("connection", "").lower()
+                    keep_alive = conn == "keep-alive" if version == "HTTP/1.0" else conn != "close"
+                    if "chunked" in fields.get("transfer-encoding", "").lower():
+                        keep_alive = False
+                        raise HttpError(411, "send Content-Length, not chunked")
+                    length = int(fields.get("content-length") or 0)
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HttpError(413, f"body over {MAX_BODY} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload, headers = await self.dispatch(method.upper(), path, body)
+                except HttpError as e:
+                    status, payload, headers = e.status, {"error": str(e)}, e.headers
+                except ValueError as e:
+                    status, payload, keep_alive = 400, {"error": f"bad request: {e}"}, False
+                except Exception as e:
+                    print(f"⚠️ quote service: {type(e).__name__}: {e}", file=sys.stderr)
+                    status, payload = 500, {"error": "internal error"}
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode()
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{k}: {v}" for k, v in headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                quotes = len(payload["results"]) if "results" in payload else int(status == 200 and route == "POST /quote")
+                self.stats.record(route if status != 404 else "unknown", status, (time.perf_counter() - t0) * 1000, quotes)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def warm_up(self):
+        """Load both regimen tabs and start the workers before the first request."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.index.preload)
+        pool = self._executor()
+        await asyncio.gather(*[loop.run_in_executor(pool, price_unique, [], False) for _ in range(max(self.workers, 1))])
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+        """Serve until SIGINT / SIGTERM (the caller then ``close()``s the worker pool)."""
+        await self.warm_up()
+        server = await asyncio.start_server(self.handle, host, port)
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+            except (NotImplementedError, RuntimeError):     # Windows, or not the main thread
+                pass
+        if ready is not None:
+            ready(server)
+        async with server:
+            await stop
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,69 @@
+"""Scalar PAP simulation: one regimen, one patient."""
+from datetime import timedelta
+
+import pandas as pd
+
+from .regimen import as_spec
+from .vials import calculate_vials
+
+
+# 🟢 Modified to accept 'round_down_mode'
+def run_simulation(spec, weight, stock_o, multiplier, start_dt, skip_wknd, sector, round_down_mode=False):
+    spec = as_spec(spec)
+    p1_limit, p1_o_freq, p1_y_freq = spec.p1_cycle_limit, spec.p1_o_freq, spec.p1_y_freq
+    cap_limit, has_p2 = spec.cap_months, spec.has_p2
+    
+    timeline, total_paid, curr_date, cycle, weeks = [], 0.0, start_dt, 1, 1 
+    o_admin_total, y_admin_total, y_paid_rounds, o_paid_accum, p1_c, p2_c = 0, 0, 0, 0.0, 0.0, 0.0
+
+    while weeks <= 104:
+        is_p1 = (cycle <= p1_limit)
+        if not is_p1 and not has_p2: break
+        display_date = curr_date
+        if skip_wknd:
+            if display_date.weekday() == 5: display_date += timedelta(days=2)
+            elif display_date.weekday() == 6: display_date += timedelta(days=1)
+        curr_m, freq = ((weeks - 1) // 4) + 1, (p1_o_freq if is_p1 else spec.p2_freq)
+        
+        o_mg = (spec.p1_o if is_p1 else spec.p2_o).mg(weight)
+        y_mg = spec.p1_y.mg(weight) if (is_p1 and (weeks - 1) % p1_y_freq == 0) else 0.0
+        
+        # 🟢 Apply Rounding to Yervoy
+        o_cost, o_v = calculate_vials(o_mg, 'O', stock_o, multiplier)
+        y_cost, y_v = calculate_vials(y_mg, 'Y', [50], multiplier, round_down=round_down_mode)
+        
+        o_p, y_p, status_msg = 0.0, 0.0, ""
+        
+        if o_mg > 0 and curr_m <= cap_limit:
+            o_admin_total += 1
+            if o_admin_total % 2 != 0:
+                if (((weeks + freq - 1) // 4) + 1) <= cap_limit:
+                    o_p = o_cost
+                else:
+                    o_p = o_cost * 0.5
+                    status_msg = " (Pay 50%)"
+                o_paid_accum += (1.0 if "50%" not in status_msg else 0.5)
+
+        if y_mg > 0 and curr_m <= cap_limit:
+            y_admin_total += 1
+            should_pay_y = (y_admin_total % 2 != 0)
+            
+            # 🏛️ GOVERNMENT RULE
+            if str(sector).lower() == "government" and y_paid_rounds >= 2:
+                should_pay_y = False
+            
+            if should_pay_y:
+                if (((weeks + p1_y_freq - 1) // 4) + 1) <= cap_limit:
+                     y_p = y_cost
+                else:
+                     y_p = y_cost * 0.5
+                y_paid_rounds += 1
+
+        total_paid += (o_p + y_p)
+        if is_p1 and p1_c == 0 and (o_p + y_p) > 0: p1_c = (o_p + y_p)
+        if not is_p1 and p2_c == 0 and (o_p + y_p) > 0: p2_c = (o_p + y_p)
+        
+        timeline.append({"Phase": f"Phase {1 if is_p1 else 2}", "Cycle": cycle, "RawDate": display_date, "Date": display_date.strftime("%d %b %Y (%a)"),"Month": curr_m, "Opdivo Vials": o_v, "Yervoy Vials": y_v if y_mg > 0 else "-", "Opdivo (฿)": o_p, "Yervoy (฿)": y_p, "Total (฿)": (o_p + y_p), "Status": f"Paid{status_msg}" if (o_p + y_p) > 0 else "Free"})
+        weeks, cycle, curr_date = weeks + freq, cycle + 1, curr_date + timedelta(weeks=freq)
+    
+    return total_paid, o_paid_accum, p1_c, p2_c, pd.DataFrame(timeline), cap_limit, has_p2
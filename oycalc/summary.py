@@ -0,0 +1,56 @@
+"""Summary-only PAP pricing: the totals of ``run_simulation`` without a timeline.
+
+The pay rules - paid cycles before ``PAP_Cap_Months``, the 50% boundary
+cycle, every other administration free, the Government two-Yervoy-round cap -
+depend only on the regimen and the sector, so they are counted once per
+(regimen, sector) from the compiled ``Schedule`` into a *pay plan*: the pay
+factors of the cycles that cost anything, in order.  Pricing a patient is
+then three vial-table lookups and one pass over the paid cycles (about a
+dozen), with no dates, strings or DataFrame.
+
+The paid amounts are still added cycle by cycle in schedule order, so the
+float totals are bit-identical to ``run_simulation``.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from .batch import compile_schedule
+from .regimen import as_spec
+from .vials import ROUND_DOWN_ALLOWANCE, get_vial_table
+
+Totals = namedtuple('Totals', 'total o_paid_rounds p1_cost p2_cost cap_months has_p2')
+
+
+@lru_cache(maxsize=1024)
+def pay_plan(spec, government):
+    """``((is_p1, o_factor, y_factor), ...)`` for every cycle with something to pay, plus paid Opdivo rounds."""
+    sched = compile_schedule(spec)
+    y_factor = sched.y_factor("Government" if government else "Private")
+    plan = tuple((bool(p1), float(of), float(yf))
+                 for p1, of, yf in zip(sched.is_p1, sched.o_factor, y_factor) if of or yf)
+    return plan, sched.o_paid_rounds
+
+
+def _cost(table, mg):
+    return table.cost(mg) if mg > 0 else 0.0
+
+
+def simulate_totals(spec, weight, stock_o, multiplier, sector, round_down_mode=False):
+    """Same totals as ``run_simulation`` (which also takes dates, unused here), as ``Totals``."""
+    spec = as_spec(spec)
+    plan, o_rounds = pay_plan(spec, str(sector).lower() == "government")
+    o_table = get_vial_table('O', stock_o, multiplier)
+    o1, o2 = _cost(o_table, spec.p1_o.mg(weight)), _cost(o_table, spec.p2_o.mg(weight))
+    y_mg = spec.p1_y.mg(weight)
+    y_target = max(0, y_mg - ROUND_DOWN_ALLOWANCE) if round_down_mode else y_mg
+    y = get_vial_table('Y', [50], multiplier).cost(y_target) if y_mg > 0 else 0.0
+
+    total_paid, p1_c, p2_c = 0.0, 0.0, 0.0
+    for p1, of, yf in plan:
+        o_cost = o1 if p1 else o2
+        o_p = o_cost if of == 1.0 else (o_cost * 0.5 if of else 0.0)
+        y_p = y if yf == 1.0 else (y * 0.5 if yf else 0.0)
+        total_paid += (o_p + y_p)
+        if p1 and p1_c == 0 and (o_p + y_p) > 0: p1_c = (o_p + y_p)
+        if not p1 and p2_c == 0 and (o_p + y_p) > 0: p2_c = (o_p + y_p)
+    return Totals(total_paid, o_rounds, p1_c, p2_c, spec.cap_months, spec.has_p2)
@@ -0,0 +1,155 @@
+"""Columnar simulation timeline.
+
+``Timeline`` keeps one NumPy array per column instead of a frame of per-row
+dicts:
+
+===============  ==============  =========================================
+column           dtype           meaning
+===============  ==============  =========================================
+phase            int8            1 or 2
+cycle            int16
+date             datetime64[D]   appointment (after the skip-weekend shift)
+month            int16           treatment month, 1-based
+o_40 .. o_120    int8            Opdivo vials of each size
+y_50             int8            Yervoy vials
+yervoy_given     bool            Yervoy is given this cycle (may be 0 vials
+                                 in round-down mode)
+opdivo_baht      float64         patient pays, unrounded (as ``run_simulation``)
+yervoy_baht      float64
+total_baht       float64         opdivo + yervoy, rounded only for display
+status           int8            index into ``STATUSES``
+===============  ==============  =========================================
+
+``frame`` (categorical phase / status, for Arrow and Parquet) and
+``display`` (the on-screen table: text columns preformatted, amounts kept
+numeric so the table sorts them as numbers) are built on
+first use and cached on the object, and the object itself is cached by
+``SimulationCache``, so a rerun with unchanged inputs reformats nothing.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .vials import O_SIZES, Y_SIZES
+
+PHASES = ("Phase 1", "Phase 2")
+STATUSES = ("Paid", "Paid (Pay 50%)", "Free")
+O_COLUMNS = tuple(f"o_{s}" for s in O_SIZES)
+Y_COLUMNS = tuple(f"y_{s}" for s in Y_SIZES)
+AMOUNT_COLUMNS = ("opdivo_baht", "yervoy_baht", "total_baht")
+COLUMNS = ("phase", "cycle", "date", "month") + O_COLUMNS + Y_COLUMNS + ("yervoy_given",) + AMOUNT_COLUMNS + ("status",)
+DTYPES = dict({"phase": np.int8, "cycle": np.int16, "date": "datetime64[D]", "month": np.int16,
+               "yervoy_given": bool, "status": np.int8},
+              **{c: np.int8 for c in O_COLUMNS + Y_COLUMNS}, **{c: np.float64 for c in AMOUNT_COLUMNS})
+DISPLAY_COLUMNS = ["Phase", "Cycle", "Date", "Month", "Opdivo Vials", "Yervoy Vials",
+                   "Opdivo (฿)", "Yervoy (฿)", "Total (฿)", "Status"]
+DISPLAY_AMOUNTS = ["Opdivo (฿)", "Yervoy (฿)", "Total (฿)"]
+
+
+def _vials_text(counts, sizes):
+    """``"100mg x 2, 40mg x 1"`` from a (rows, sizes) count matrix, largest size first."""
+    order = np.argsort(sizes)[::-1]
+    return [", ".join(f"{sizes[j]}mg x {row[j]}" for j in order if row[j]) for row in counts]
+
+
+class Timeline:
+    def __init__(self, cols):
+        self.cols = cols
+
+    @classmethod
+    def build(cls, sched, o_mg, y_dose, o_chains, y_chain, o_pay, y_pay, status, dates=None):
+        """From ``SimulationCache`` layers: per-cycle Opdivo doses, the vial chains per dose and the priced cycles.
+
+        Without ``dates`` the date column is NaT; ``with_dates`` fills it in.
+        """
+        n = sched.cycles
+        cols = {"phase": np.where(sched.is_p1, 1, 2).astype(np.int8),
+                "cycle": np.arange(1, n + 1, dtype=np.int16),
+                "date": np.full(n, np.datetime64("NaT"), dtype="datetime64[D]") if dates is None
+                else np.array(dates, dtype="datetime64[D]").reshape(n),
+                "month": sched.month.astype(np.int16)}
+        o_counts = np.zeros((n, len(O_SIZES)), dtype=np.int8)
+        for mg in set(o_mg):
+            if mg > 0:
+                rows = np.fromiter((m == mg for m in o_mg), dtype=bool, count=n)
+                for size in o_chains[mg] or ():       # None: no vial size in stock
+                    o_counts[rows, O_SIZES.index(size)] += 1
+        y_counts = np.zeros((n, len(Y_SIZES)), dtype=np.int8)
+        if y_dose > 0:
+            for size in y_chain:
+                y_counts[sched.y_admin, Y_SIZES.index(size)] += 1
+        cols.update({c: o_counts[:, j] for j, c in enumerate(O_COLUMNS)})
+        cols.update({c: y_counts[:, j] for j, c in enumerate(Y_COLUMNS)})
+        cols["yervoy_given"] = sched.y_admin & (y_dose > 0)
+        o_baht, y_baht = np.asarray(o_pay, dtype=float).reshape(n), np.asarray(y_pay, dtype=float).reshape(n)
+        cols.update({"opdivo_baht": o_baht, "yervoy_baht": y_baht, "total_baht": o_baht + y_baht,
+                     "status": np.array([STATUSES.index(s) for s in status], dtype=np.int8).reshape(n)})
+        return cls(cols)
+
+    @classmethod
+    def concat(cls, timelines):
+        timelines = list(timelines)
+        if not timelines:
+            return cls.empty()
+        return cls({c: np.concatenate([t.cols[c] for t in timelines]) for c in COLUMNS})
+
+    @classmethod
+    def empty(cls):
+        return cls({c: np.zeros(0, dtype=DTYPES[c]) for c in COLUMNS})
+
+    def with_dates(self, dates):
+        """Same columns with another appointment date per row (the rest is shared, not copied)."""
+        return Timeline(dict(self.cols, date=np.array(dates, dtype="datetime64[D]").reshape(len(self))))
+
+    def __len__(self):
+        return len(self.cols["cycle"])
+
+    @property
+    def is_empty(self):
+        return len(self) == 0
+
+    @cached_property
+    def frame(self):
+        """Typed DataFrame: categorical phase / status, integer vials, float baht, datetime64 date."""
+        cols = dict(self.cols)
+        cols["phase"] = pd.Categorical.from_codes(cols["phase"] - 1, categories=PHASES)
+        cols["status"] = pd.Categorical.from_codes(cols["status"], categories=STATUSES)
+        return pd.DataFrame(cols, columns=list(COLUMNS))
+
+    @cached_property
+    def vials_text(self):
+        """(Opdivo, Yervoy) breakdown strings per row, as ``calculate_vials`` writes them."""
+        o = np.column_stack([self.cols[c] for c in O_COLUMNS])
+        y = np.column_stack([self.cols[c] for c in Y_COLUMNS])
+        o_text = [t or "-" for t in _vials_text(o, O_SIZES)]
+        y_text = [t if given else "-" for t, given in zip(_vials_text(y, Y_SIZES), self.cols["yervoy_given"])]
+        return o_text, y_text
+
+    @cached_property
+    def display(self):
+        """The on-screen table; text formatted once, amounts numeric (``DISPLAY_AMOUNTS``, format them in the view)."""
+        if self.is_empty:
+            return pd.DataFrame(columns=DISPLAY_COLUMNS)
+        o_text, y_text = self.vials_text
+        return pd.DataFrame({
+            "Phase": [PHASES[p - 1] for p in self.cols["phase"].tolist()],
+            "Cycle": self.cols["cycle"], "Date": pd.DatetimeIndex(self.cols["date"]).strftime("%d %b %Y (%a)"),
+            "Month": self.cols["month"], "Opdivo Vials": o_text, "Yervoy Vials": y_text,
+            "Opdivo (฿)": self.cols["opdivo_baht"], "Yervoy (฿)": self.cols["yervoy_baht"],
+            "Total (฿)": self.cols["total_baht"],
+            "Status": [STATUSES[s] for s in self.cols["status"].tolist()],
+        })
+
+    @property
+    def free(self):
+        return self.cols["status"] == STATUSES.index("Free")
+
+    def phase1_vials(self):
+        """(Opdivo, Yervoy) vial text of a Phase 1 cycle, or None without Phase 1."""
+        p1 = self.cols["phase"] == 1
+        if not p1.any():
+            return None
+        o_text, y_text = self.vials_text
+        with_y = np.flatnonzero(p1 & self.cols["yervoy_given"])
+        return o_text[np.argmax(p1)], (y_text[with_y[0]] if len(with_y) else "-")
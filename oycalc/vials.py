@@ -0,0 +1,192 @@
+"""Vial-packing engine.
+
+A ``VialTable`` is built once per (drug, available sizes, multiplier) and holds
+the cheapest vial combination for every whole-mg dose up to ``max_mg``.  It is
+filled bottom-up, so large doses never touch the recursion limit, and it keeps
+the exact cost / tie-break rules of the original recursive solver:
+
+* a combination wins if it is cheaper by more than 0.01 baht,
+* within 0.01 baht the one with fewer vials wins,
+* otherwise the first one found (largest vial size first) is kept.
+
+All vial sizes are whole mg, so a fractional dose costs the same as its ceiling.
+"""
+import math
+import threading
+import weakref
+from functools import lru_cache
+
+from . import instrument
+
+PRICES = {'O_40': 23540, 'O_100': 58850, 'O_120': 70620, 'Y_50': 63558}
+O_SIZES = (40, 100, 120)
+Y_SIZES = (50,)
+
+# 150 kg x 10 mg/kg covers every weight-based dose the UI can produce.
+MAX_MG = 1500
+ROUND_DOWN_ALLOWANCE = 49.9
+
+
+def vial_options(drug_type, available_stock, multiplier=1.0):
+    """(size, price) pairs in the solver's search order: largest vial first."""
+    if drug_type == 'O':
+        sizes = sorted([s for s in O_SIZES if s in available_stock], reverse=True)
+        return tuple((s, round(PRICES[f'O_{s}'] * multiplier, 2)) for s in sizes)
+    return ((50, round(PRICES['Y_50'] * multiplier, 2)),)
+
+
+class VialTable:
+    __slots__ = ('options', 'max_mg', '_cost', '_vials', '_last', '_combos', '_texts', '_lock', '__weakref__')
+
+    def __init__(self, options, max_mg=MAX_MG):
+        self.options = tuple(options)
+        self.max_mg = 0
+        self._cost = [0.0]
+        self._vials = [0]
+        self._last = [None]     # vial added on top of the best combo for n - size
+        self._combos = {0: ()}  # breakdowns / texts are derived on first use
+        self._texts = {}
+        self._lock = threading.Lock()
+        self._extend(max_mg)
+
+    def _extend(self, max_mg):
+        with self._lock, instrument.span("vials.solve"):
+            cost, vials, last, options = self._cost, self._vials, self._last, self.options
+            for n in range(self.max_mg + 1, max_mg + 1):
+                best_cost, min_vials, best_size = float('inf'), float('inf'), None
+                for size, price in options:
+                    rest = n - size if n > size else 0
+                    current_cost = price + cost[rest]
+                    current_vials = 1 + vials[rest]
+                    if current_cost < (best_cost - 0.01) or (
+                            abs(current_cost - best_cost) <= 0.01 and current_vials < min_vials):
+                        best_cost, min_vials, best_size = current_cost, current_vials, size
+                cost.append(best_cost)
+                vials.append(min_vials)
+                last.append(best_size)
+            self.max_mg = max(self.max_mg, max_mg)
+
+    def _index(self, mg):
+        n = math.ceil(mg) if mg > 0 else 0
+        if n > self.max_mg:
+            self._extend(max(n, 2 * self.max_mg))
+        return n
+
+    def _chain(self, n):
+        """Vials the solver stacked for ``n``, top first (``n``'s own vial, then its rest's)."""
+        sizes = []
+        while n > 0 and self._last[n] is not None:
+            size = self._last[n]
+            sizes.append(size)
+            n = n - size if n > size else 0
+        return sizes
+
+    def _combo(self, n):
+        """(size, count) pairs, largest size first."""
+        combo = self._combos.get(n)
+        if combo is None:
+            counts = {}
+            for size in self._chain(n):
+                counts[size] = counts.get(size, 0) + 1
+            combo = self._combos[n] = tuple(sorted(counts.items(), reverse=True))
+        return combo
+
+    def _text(self, n):
+        text = self._texts.get(n)
+        if text is None:
+            text = self._texts[n] = ", ".join(f"{s}mg x {c}" for s, c in self._combo(n))
+        return text
+
+    def cost(self, mg):
+        return self._cost[self._index(mg)]
+
+    def breakdown(self, mg):
+        """Vial counts per size, e.g. ``{100: 1, 40: 2}``."""
+        return dict(self._combo(self._index(mg)))
+
+    def vial_count(self, mg):
+        return self._vials[self._index(mg)]
+
+    def text(self, mg):
+        return self._text(self._index(mg))
+
+    def cost_array(self, max_mg):
+        """Costs indexed by whole mg, ``0..max_mg`` inclusive."""
+        self._index(max_mg)
+        return self._cost[:max_mg + 1]
+
+    def change_points(self, lo, hi):
+        """Whole-mg doses ``n`` in ``lo+1..hi`` whose combination or cost differs from ``n - 1``."""
+        self._index(hi)
+        cost, combo = self._cost, self._combo
+        return [n for n in range(max(lo, 0) + 1, hi + 1) if cost[n] != cost[n - 1] or combo(n) != combo(n - 1)]
+
+    def lookup(self, mg):
+        """(cost, breakdown text) for a dose, same shape as ``calculate_vials``."""
+        n = self._index(mg)
+        return self._cost[n], self._text(n)
+
+    def choice(self, mg):
+        """(vial chain, breakdown text) for a dose; price the chain with ``chain_cost``.
+
+        The chain is None when no vial combination covers the dose (no sizes
+        in stock): ``cost`` is inf there, and so is ``chain_cost(None, ...)``.
+        """
+        n = self._index(mg)
+        return (tuple(self._chain(n)) if self._cost[n] != float('inf') else None), self._text(n)
+
+
+def scales_exactly(drug_type, available_stock, multiplier):
+    """True if the base table's choices are the ones a table at ``multiplier`` would make.
+
+    The Opdivo prices are whole tens of baht, so two Opdivo combinations cost
+    the same or differ by at least 10 baht; Yervoy has a single vial size, so
+    its choice never depends on price.  Scaling all prices by the same factor
+    keeps that order, ties included, unless rounding to the satang moved a
+    price - which never happens for a whole-percent markup.
+    """
+    if multiplier < 0.01 or not vial_options(drug_type, available_stock):
+        return False
+    return all(abs(p - base * multiplier) < 1e-6 for (_, p), (_, base)
+               in zip(vial_options(drug_type, available_stock, multiplier), vial_options(drug_type, available_stock)))
+
+
+def chain_cost(chain, options):
+    """Cost of a ``VialTable.choice`` chain at ``(size, price)`` options, summed in the solver's order
+    (bit-identical to ``cost`` of a table solved at those prices when both choose the same vials)."""
+    if chain is None:
+        return float('inf')
+    price, cost = dict(options), 0.0
+    for size in reversed(chain):
+        cost = price[size] + cost
+    return cost
+
+
+_TABLES = weakref.WeakValueDictionary()     # live tables, for memo_stats()
+
+
+@lru_cache(maxsize=256)
+def _table(options):
+    table = _TABLES[options] = VialTable(options)
+    return table
+
+
+def get_vial_table(drug_type, available_stock, multiplier=1.0):
+    """Shared table for this stock/price combination (LRU-cached across reruns)."""
+    return _table(vial_options(drug_type, available_stock, multiplier))
+
+
+def memo_stats():
+    """Shared vial tables: LRU hits/misses, tables held, whole-mg rows solved, combos decoded."""
+    info = _table.cache_info()
+    tables = list(_TABLES.values())
+    return {'hits': info.hits, 'misses': info.misses, 'tables': info.currsize,
+            'mg_rows': sum(t.max_mg + 1 for t in tables), 'combos': sum(len(t._combos) for t in tables)}
+
+
+def calculate_vials(mg_needed, drug_type, available_stock, multiplier=1.0, round_down=False):
+    if mg_needed <= 0: return 0.0, "-"
+    target_mg = mg_needed
+    if round_down:
+        target_mg = max(0, mg_needed - ROUND_DOWN_ALLOWANCE)  # Allow -49.9mg deficit
+    return get_vial_table(drug_type, available_stock, multiplier).lookup(target_mg)
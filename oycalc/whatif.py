@@ -0,0 +1,182 @@
+"""Dependency-aware cache for the interactive ``run_simulation`` call.
+
+A sidebar change usually touches one input, so the result is rebuilt from
+layers that are cached on just the inputs they depend on:
+
+=========  =========================================  ===============================
+layer      key                                        work on a miss
+=========  =========================================  ===============================
+schedule   regimen                                    cycle / pay-factor timeline
+vials      regimen, weight, stock, round mode         dose per cycle, vial choices
+prices     vials key, markup, sector                  reprice the chosen vials
+dates      regimen, start date, skip weekend          appointment dates
+columns    vials key, markup, sector                  ``Timeline`` without dates
+timeline   everything                                 attach the date column (app)
+result     everything                                 ``run_simulation`` DataFrame
+=========  =========================================  ===============================
+
+The vial choices come from the shared tables at purchase price.  They hold at
+any multiplier that scales the vial prices exactly (``scales_exactly``: every
+whole-percent markup), so a markup change only re-adds the chosen vials at the
+new prices.  Other multipliers round a price to the satang, which can break a
+tie the other way, and are looked up in a table solved at that multiplier.  A
+date change only swaps the date column.  Results are identical to
+``run_simulation``.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+
+from .batch import compile_schedule
+from .regimen import as_spec
+from .timeline import Timeline
+from .vials import ROUND_DOWN_ALLOWANCE, chain_cost, get_vial_table, scales_exactly, vial_options
+
+LAYERS = ('schedule', 'vials', 'prices', 'dates', 'columns', 'timeline', 'result')
+
+
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+
+class SimulationCache:
+    def __init__(self, maxsize=256):
+        self._layers = {name: _LRU(maxsize) for name in LAYERS}
+        self._lock = threading.Lock()
+
+    # ---------- cache plumbing ----------
+    def _get(self, layer, key, build):
+        lru = self._layers[layer]
+        with self._lock:
+            if key in lru.data:
+                lru.hits += 1
+                lru.data.move_to_end(key)
+                return lru.data[key]
+            lru.misses += 1
+        value = build()
+        with self._lock:
+            lru.data[key] = value
+            if len(lru.data) > lru.maxsize:
+                lru.data.popitem(last=False)
+        return value
+
+    def stats(self):
+        """``{layer: {'hits', 'misses', 'size'}}`` since start-up (or ``clear``)."""
+        with self._lock:
+            return {name: {'hits': lru.hits, 'misses': lru.misses, 'size': len(lru.data)}
+                    for name, lru in self._layers.items()}
+
+    def clear(self):
+        with self._lock:
+            for lru in self._layers.values():
+                lru.data.clear()
+                lru.hits = lru.misses = 0
+
+    # ---------- layers ----------
+    def _vials(self, spec, sched, weight, stock, round_down):
+        """Per-cycle doses and the vial choice (chain, text) of each distinct dose at purchase price."""
+        o_mg = [(spec.p1_o if p1 else spec.p2_o).mg(weight) for p1 in sched.is_p1]
+        y_dose = spec.p1_y.mg(weight)
+        y_mg = [y_dose if admin else 0.0 for admin in sched.y_admin]
+        y_target = max(0, y_dose - ROUND_DOWN_ALLOWANCE) if round_down else y_dose
+        o_table, y_table = get_vial_table('O', stock), get_vial_table('Y', [50])
+        o_choice = {mg: o_table.choice(mg) for mg in set(o_mg) if mg > 0}
+        y_choice = y_table.choice(y_target) if any(y_mg) else None
+        return o_mg, y_mg, y_target, o_choice, y_choice
+
+    def _prices(self, vials, sched, stock, multiplier, sector):
+        o_mg, y_mg, y_target, o_choice, y_choice = vials
+        if not (scales_exactly('O', stock, multiplier) and scales_exactly('Y', [50], multiplier)):
+            # a price rounded to the satang may break a tie differently: use a table solved at these prices
+            o_table, y_table = get_vial_table('O', stock, multiplier), get_vial_table('Y', [50], multiplier)
+            o_choice = {mg: o_table.choice(mg) for mg in o_choice}
+            y_choice = y_table.choice(y_target) if y_choice else None
+        o_options, y_options = vial_options('O', stock, multiplier), vial_options('Y', [50], multiplier)
+        o_priced = {mg: (chain_cost(chain, o_options), text) for mg, (chain, text) in o_choice.items()}
+        o_priced.update({mg: (0.0, "-") for mg in o_mg if mg <= 0})
+        y_cost, y_text = (chain_cost(y_choice[0], y_options), y_choice[1]) if y_choice else (0.0, "-")
+
+        y_factor = sched.y_factor(sector)
+        total_paid, p1_c, p2_c = 0.0, 0.0, 0.0
+        o_vials, y_vials, o_pay, y_pay, totals, status = [], [], [], [], [], []
+        for i, p1 in enumerate(sched.is_p1):
+            o_cost, o_v = o_priced[o_mg[i]]
+            of, yf = sched.o_factor[i], y_factor[i]
+            o_p = o_cost if of == 1.0 else (o_cost * 0.5 if of else 0.0)
+            y_p = y_cost if yf == 1.0 else (y_cost * 0.5 if yf else 0.0)
+            total_paid += (o_p + y_p)
+            if p1 and p1_c == 0 and (o_p + y_p) > 0: p1_c = (o_p + y_p)
+            if not p1 and p2_c == 0 and (o_p + y_p) > 0: p2_c = (o_p + y_p)
+            o_vials.append(o_v)
+            y_vials.append(y_text if y_mg[i] > 0 else "-")
+            o_pay.append(o_p); y_pay.append(y_p); totals.append(o_p + y_p)
+            status.append(("Paid (Pay 50%)" if of == 0.5 else "Paid") if (o_p + y_p) > 0 else "Free")
+        chains = ({mg: chain for mg, (chain, _) in o_choice.items()}, y_choice[0] if y_choice else ())
+        return total_paid, p1_c, p2_c, o_vials, y_vials, o_pay, y_pay, totals, status, chains
+
+    def _dates(self, sched, start_dt, skip_wknd):
+        raw = []
+        for week in sched.week:
+            d = start_dt + timedelta(weeks=int(week) - 1)
+            if skip_wknd:
+                if d.weekday() == 5: d += timedelta(days=2)
+                elif d.weekday() == 6: d += timedelta(days=1)
+            raw.append(d)
+        return raw, [d.strftime("%d %b %Y (%a)") for d in raw]
+
+    # ---------- entry points ----------
+    def _priced(self, spec, weight, stock_o, multiplier, sector, round_down_mode):
+        vial_key = (spec, weight, tuple(sorted(stock_o)), bool(round_down_mode))
+        sched = self._get('schedule', spec, lambda: compile_schedule(spec))
+        vials = self._get('vials', vial_key, lambda: self._vials(spec, sched, weight, vial_key[2], round_down_mode))
+        priced = self._get('prices', vial_key + (multiplier, str(sector).lower() == "government"),
+                           lambda: self._prices(vials, sched, vial_key[2], multiplier, sector))
+        return sched, vials, priced
+
+    def timeline(self, spec, weight, stock_o, multiplier, start_dt, skip_wknd, sector, round_down_mode=False):
+        """``run`` with a columnar ``Timeline`` in place of the DataFrame."""
+        spec = as_spec(spec)
+        key = (spec, weight, tuple(sorted(stock_o)), bool(round_down_mode), multiplier,
+               str(sector).lower() == "government", start_dt, bool(skip_wknd))
+
+        def columns(sched, vials, priced):
+            o_mg, y_mg = vials[:2]
+            _, _, _, _, _, o_pay, y_pay, _, status, (o_chains, y_chain) = priced
+            return Timeline.build(sched, o_mg, max(y_mg, default=0.0), o_chains, y_chain, o_pay, y_pay, status)
+
+        def assemble():
+            sched, vials, priced = self._priced(spec, weight, stock_o, multiplier, sector, round_down_mode)
+            raw_dates, _ = self._get('dates', key[:1] + key[-2:], lambda: self._dates(sched, start_dt, skip_wknd))
+            tl = self._get('columns', key[:6], lambda: columns(sched, vials, priced)).with_dates(raw_dates)
+            total_paid, p1_c, p2_c = priced[:3]
+            return total_paid, sched.o_paid_rounds, p1_c, p2_c, tl, spec.cap_months, spec.has_p2
+
+        return self._get('timeline', key, assemble)
+
+    def run(self, spec, weight, stock_o, multiplier, start_dt, skip_wknd, sector, round_down_mode=False):
+        """Same arguments and return value as ``run_simulation``."""
+        spec = as_spec(spec)
+        key = (spec, weight, tuple(sorted(stock_o)), bool(round_down_mode), multiplier,
+               str(sector).lower() == "government", start_dt, bool(skip_wknd))
+
+        def assemble():
+            sched, _, priced = self._priced(spec, weight, stock_o, multiplier, sector, round_down_mode)
+            raw_dates, dates = self._get('dates', key[:1] + key[-2:], lambda: self._dates(sched, start_dt, skip_wknd))
+            total_paid, p1_c, p2_c, o_vials, y_vials, o_pay, y_pay, totals, status, _ = priced
+            if not sched.cycles:
+                df = pd.DataFrame([])
+            else:
+                df = pd.DataFrame({
+                    "Phase": [f"Phase {1 if p1 else 2}" for p1 in sched.is_p1],
+                    "Cycle": list(range(1, sched.cycles + 1)), "RawDate": raw_dates, "Date": dates,
+                    "Month": [int(m) for m in sched.month], "Opdivo Vials": o_vials, "Yervoy Vials": y_vials,
+                    "Opdivo (฿)": o_pay, "Yervoy (฿)": y_pay, "Total (฿)": totals, "Status": status,
+                })
+            return total_paid, sched.o_paid_rounds, p1_c, p2_c, df, spec.cap_months, spec.has_p2
+
+        return self._get('result', key, assemble)
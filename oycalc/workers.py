@@ -0,0 +1,16 @@
+"""Worker process pools shared by comparison, bulk quoting and the quote service."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(max_workers=None):
+    """``ProcessPoolExecutor`` whose workers are spawned, never forked.
+
+    The app and the service run threads (Streamlit's server, the sheet
+    refresh and visit counter workers, asyncio's executor), and a forked
+    child inherits their locks in whatever state they were - possibly held
+    by a thread that does not exist in the child.  Spawned workers start a
+    fresh interpreter; the CLI uses the same start method so it behaves the
+    same on every platform.
+    """
+    return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from oycalc import FileSource, RegimenStore  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+
+
+@pytest.fixture
+def store():
+    return RegimenStore(FileSource(FIXTURES), cache_dir=None)
@@ -0,0 +1,59 @@
+import pytest
+
+from oycalc.counter import CounterApiBackend, SQLiteBackend, VisitCounter
+
+
+class FlakySession:
+    """Stands in for ``requests.Session``: ``/up`` fails on the calls listed in ``fail``."""
+
+    def __init__(self, fail=()):
+        self.count, self.calls, self.fail = 0, 0, set(fail)
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if self.calls in self.fail:
+            raise ConnectionError("flaky")
+        if url.endswith("/up"):
+            self.count += 1
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"count": self.count}
+
+
+def test_sqlite_counter_flushes_batches(tmp_path):
+    counter = VisitCounter(SQLiteBackend(str(tmp_path / "c.db")), flush_interval=60)
+    for _ in range(5):
+        counter.increment()
+    assert counter.flush(5)
+    assert counter.backend.read() == 5
+    assert counter.count() == 5
+
+
+def test_partial_flush_is_not_sent_twice():
+    backend = CounterApiBackend()
+    backend._session = FlakySession(fail={3})
+    counter = VisitCounter(backend, flush_interval=60)
+    for _ in range(5):
+        counter.increment()
+    counter.flush(5)                        # hits 1-2 land, call 3 fails
+    assert backend.session.count == 2 and counter._pending == 3
+    counter.flush(5)                        # only the 3 still pending are sent
+    assert backend.session.count == 5 and counter._pending == 0
+
+
+def test_nothing_counted_raises():
+    backend = CounterApiBackend()
+    backend._session = FlakySession(fail={1})
+    with pytest.raises(ConnectionError):
+        backend.add(3)
+
+
+def test_close_pushes_pending(tmp_path):
+    counter = VisitCounter(SQLiteBackend(str(tmp_path / "c.db")), flush_interval=60)
+    counter.increment()
+    counter.close()
+    assert counter.backend.read() == 1
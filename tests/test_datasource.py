@@ -0,0 +1,91 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from oycalc.datasource import FileSource, RegimenStore
+
+from conftest import FIXTURES
+
+
+class GatedSource(FileSource):
+    """FileSource whose fetches of ``slow_tab`` wait for ``gate``; counts fetches per tab."""
+
+    def __init__(self, directory, slow_tab=None):
+        super().__init__(directory)
+        self.slow_tab, self.gate, self.fetches = slow_tab, threading.Event(), {}
+
+    def fetch(self, tab, etag=None):
+        self.fetches[tab] = self.fetches.get(tab, 0) + 1
+        if tab == self.slow_tab:
+            assert self.gate.wait(10)
+        return super().fetch(tab, etag)
+
+
+class DownSource:
+    def fetch(self, tab, etag=None):
+        raise ConnectionError("sheet unreachable")
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    directory = tmp_path / "sheets"
+    shutil.copytree(FIXTURES, directory)
+    return directory
+
+
+def _settle(store, tab):
+    deadline = time.time() + 10
+    while tab in store._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_cold_load_does_not_block_other_tab_refresh(sheets):
+    source = GatedSource(sheets, slow_tab="Private")
+    store = RegimenStore(source, ttl=0)
+    store.get("Government")
+    cold = threading.Thread(target=store.get, args=("Private",))
+    cold.start()
+    while source.fetches.get("Private") != 1:
+        time.sleep(0.01)
+    started = time.time()
+    store.get("Government")                 # stale: must come back while Private is still loading
+    assert time.time() - started < 1 and cold.is_alive()
+    source.gate.set()
+    cold.join(10)
+    assert "Private" in store._data
+
+
+def test_unchanged_sheet_is_not_reparsed(sheets):
+    source = GatedSource(sheets)
+    store = RegimenStore(source, ttl=0)
+    first = store.get("Government")
+    store.refresh("Government")             # same mtime: the ETag short-circuits
+    os.utime(sheets / "Government.csv", ns=(1, 1))
+    again = store.refresh("Government")     # new ETag, same bytes: the digest short-circuits
+    assert again.df is first.df and again.etag != first.etag
+
+
+def test_stale_snapshot_is_served_then_revalidated(sheets):
+    store = RegimenStore(FileSource(sheets), ttl=0)
+    store.get("Government")
+    _settle(store, "Government")            # ttl=0: the first get already started a (no-op) refresh
+    first = store.get("Government")
+    _settle(store, "Government")
+    with open(sheets / "Government.csv", "a") as f:
+        f.write("\n")
+    os.utime(sheets / "Government.csv", ns=(2, 2))
+    stale = store.get("Government")         # served stale, refresh started
+    assert stale.digest == first.digest and stale.df is first.df
+    _settle(store, "Government")
+    assert store.get("Government").digest != first.digest
+
+
+def test_snapshot_round_trip(sheets, tmp_path):
+    first = RegimenStore(FileSource(sheets), cache_dir=str(tmp_path / "cache")).get("Private")
+    offline = RegimenStore(DownSource(), cache_dir=str(tmp_path / "cache")).get("Private")
+    assert offline.digest == first.digest and offline.etag == first.etag
+    assert offline.df.equals(first.df)
+    assert [s.name for s in offline.specs] == [s.name for s in first.specs]
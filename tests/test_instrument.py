@@ -0,0 +1,12 @@
+from oycalc import instrument
+
+
+def test_only_session_recorder_tracks_runs():
+    plain, session = instrument.Recorder(window=10), instrument.Recorder(track_run=True)
+    for _ in range(1000):
+        plain.add("quote", 1.0)
+        session.add("quote", 1.0)
+    assert plain.run() == {} and plain.summary()["quote"]["n"] == 10
+    assert session.run() == {"quote": 1000.0}
+    session.begin_run()
+    assert session.run() == {}
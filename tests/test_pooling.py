@@ -0,0 +1,78 @@
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from oycalc import SimulationCache, calculate_vials
+from oycalc.pooling import DAY_COLUMNS, plan_pooling, pool_csv
+from oycalc.quote import RegimenIndex, prepare_row
+from oycalc.vials import ROUND_DOWN_ALLOWANCE
+
+REGIMEN = {'sector': 'Government', 'indication': 'NSCLC', 'regimen': 'O 360mg q3w + Y 1mg/kg q6w'}
+SATURDAY, MONDAY = '2026-01-03', '2026-01-05'
+
+
+def _jobs(store, rows):
+    index = RegimenIndex(store)
+    return [prepare_row(dict(REGIMEN, **r), index, k)[0] for k, r in enumerate(rows)]
+
+
+def _mixed(store):
+    rows = [{'weight': w, 'start_date': d, 'stock': s, 'round_down': rd, 'regimen': reg}
+            for w, d, s, rd, reg in [(48.5, MONDAY, '40;100;120', 'no', REGIMEN['regimen']),
+                                      (61.0, SATURDAY, '40;100;120', 'yes', REGIMEN['regimen']),
+                                      (72.5, '2026-01-12', '40;100;120', 'no', 'O 3mg/kg q2w + Y 1mg/kg q6w'),
+                                      (88.0, MONDAY, '40;100;120', 'yes', 'O 3mg/kg q2w + Y 1mg/kg q6w')]]
+    return _jobs(store, rows)
+
+
+def test_separate_cost_is_summed_calculate_vials(store):
+    jobs = _mixed(store)
+    plan = plan_pooling(jobs)
+    expected, cache = defaultdict(float), SimulationCache()
+    for ident, spec, weight, stock, markup, start, skip, sector, round_down in jobs:
+        tl = cache.timeline(spec, weight, stock, 1 + markup / 100, start, skip, sector, round_down)[4]
+        for d, phase, y_given in zip(tl.cols['date'], tl.cols['phase'], tl.cols['yervoy_given']):
+            o_mg = (spec.p1_o if phase == 1 else spec.p2_o).mg(weight)
+            expected[d] += calculate_vials(o_mg, 'O', (40, 100, 120))[0]
+            if y_given:
+                expected[d] += calculate_vials(spec.p1_y.mg(weight), 'Y', [50], round_down=round_down)[0]
+    days = plan.days.set_index('date')
+    assert list(plan.days.columns) == DAY_COLUMNS and len(days) == len(expected)
+    for d, cost in expected.items():
+        assert days.at[pd.Timestamp(d), 'separate_cost'] == cost
+    assert (plan.days['pooled_cost'] <= plan.days['separate_cost']).all()
+    assert plan.days['saved'].sum() > 0
+
+
+def test_doses_group_by_shifted_date(store):
+    plan = plan_pooling(_jobs(store, [{'weight': 60, 'start_date': MONDAY},
+                                      {'weight': 60, 'start_date': SATURDAY},          # moved to Monday
+                                      {'weight': 60, 'start_date': SATURDAY, 'skip_weekend': 'no'}]))
+    first = plan.days.iloc[:2]
+    assert first['date'].dt.strftime('%Y-%m-%d').tolist() == [SATURDAY, MONDAY]
+    assert first['patients'].tolist() == [1, 2]
+    assert first['opdivo_mg'].tolist() == [360.0, 720.0]
+    # 720 mg shared is 6 x 120 mg; alone each 360 mg dose is 3 x 120 mg - no waste either way
+    assert first['o_120'].tolist() == [3, 6] and first['opdivo_waste_mg'].tolist() == [0.0, 0.0]
+
+
+def test_round_down_contributes_reduced_yervoy_target(store):
+    plan = plan_pooling(_jobs(store, [{'weight': 61, 'start_date': MONDAY, 'round_down': 'yes'},
+                                      {'weight': 72, 'start_date': MONDAY}]))
+    day = plan.days.iloc[0]
+    assert np.isclose(day['yervoy_mg'], (61 - ROUND_DOWN_ALLOWANCE) + 72)
+    assert day['y_50'] == 2                       # 83.1 mg shared: 2 vials, not 1 + 2 apart
+    assert day['separate_cost'] - day['pooled_cost'] > 0
+
+
+def test_unreadable_rows_are_rejected(store, tmp_path):
+    src = tmp_path / 'patients.csv'
+    pd.DataFrame([dict(REGIMEN, patient_id='ok', weight=60, start_date=MONDAY),
+                  dict(REGIMEN, patient_id='heavy?', weight='abc', start_date=MONDAY),
+                  dict(REGIMEN, patient_id='lost', weight=60, regimen='No such regimen')]).to_csv(src, index=False)
+    plan = pool_csv(src, index=RegimenIndex(store))
+    assert plan.patients == 1
+    assert [r['patient_id'] for r in plan.rejected] == ['heavy?', 'lost']
+    assert all(r['error'] for r in plan.rejected)
@@ -0,0 +1,28 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from oycalc.quote import TIMELINE_COLUMNS, TOTAL_COLUMNS, RegimenIndex, quote_csv
+
+
+def _patients(store, path, bad_row):
+    data = store.get("Government")
+    i, spec = next(iter(data.specs.items()))
+    ind, name = str(data.df.at[i, 'Indication_Group']).strip(), spec.name.strip()
+    rows = [{'indication': ind, 'regimen': name, 'weight': 50 + k, 'sector': 'Government',
+             'start_date': '2026-01-05'} for k in range(9)]
+    rows[bad_row]['regimen'] = 'No such regimen'
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def test_parquet_error_in_later_chunk(store, tmp_path):
+    src, out, cycles = tmp_path / "p.csv", tmp_path / "out.parquet", tmp_path / "cycles.parquet"
+    _patients(store, src, bad_row=7)     # chunk 3 of 3; no patient_id column at all
+    stats = quote_csv(src, out, cycles, index=RegimenIndex(store), chunksize=3, workers=0, progress=None)
+    assert (stats.rows, stats.errors, stats.chunks) == (9, 1, 3)
+
+    totals = pd.read_parquet(out)
+    assert list(totals.columns) == TOTAL_COLUMNS
+    assert totals['error'].notna().tolist() == [k == 7 for k in range(9)]
+    assert str(pq.read_schema(out).field('error').type) == 'string'
+    assert pq.read_schema(cycles).names == TIMELINE_COLUMNS
+    assert len(pd.read_parquet(cycles)) > 0
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+from oycalc import service
+from oycalc.quote import RegimenIndex
+from oycalc.service import MAX_BODY, HttpError, QuoteService, ServiceStats
+
+
+def test_stats_stay_bounded():
+    stats = ServiceStats()
+    for k in range(100_000):
+        stats.record("/quote", 200, 1.0, 1)
+    snap = stats.snapshot()
+    assert snap["counters"]["requests"] == 100_000
+    assert snap["latency_ms"]["/quote"]["n"] == 2000
+    assert stats.latency.run() == {}
+
+
+@pytest.fixture
+def svc(store):
+    svc = QuoteService(RegimenIndex(store), workers=0)
+    yield svc
+    svc.close()
+
+
+@pytest.fixture
+def priced(monkeypatch):
+    """Jobs handed to the pool, one list per pool task."""
+    tasks, real = [], service.price_unique
+    monkeypatch.setattr(service, "price_unique", lambda jobs, timelines: tasks.append(len(jobs)) or real(jobs, timelines))
+    return tasks
+
+
+def _quote(store, weight=60.0, **extra):
+    data = store.get("Government")
+    i, spec = next(iter(data.specs.items()))
+    return dict({"sector": "Government", "indication": str(data.df.at[i, 'Indication_Group']).strip(),
+                 "regimen": spec.name.strip(), "weight": weight, "start_date": "2026-01-05"}, **extra)
+
+
+def test_identical_quotes_are_priced_once(svc, store, priced):
+    async def main():
+        return await asyncio.gather(svc.quote_many([_quote(store)]), svc.quote_many([_quote(store), _quote(store)]))
+
+    first, second = asyncio.run(main())
+    assert priced == [1]
+    assert first[0] == second[0] == second[1] and first[0]["error"] is None
+    assert svc.stats.latency.counters()["coalesced"] == 2      # both quotes of the second request joined the first
+    assert svc.queued == 0 and not svc._inflight
+
+
+def test_full_queue_answers_503(store):
+    svc = QuoteService(RegimenIndex(store), workers=0, max_queue=2)
+
+    async def main():
+        busy = asyncio.ensure_future(svc.quote_many([_quote(store, 50), _quote(store, 51)]))
+        await asyncio.sleep(0)                  # the first request is queued, not yet priced
+        with pytest.raises(HttpError) as e:
+            await svc.dispatch("POST", "/quote", json.dumps(_quote(store, 52)).encode())
+        assert e.value.status == 503 and e.value.headers == {"Retry-After": "1"}
+        await busy
+        # idle again: a batch larger than max_queue is still taken
+        return await svc.dispatch("POST", "/quote/batch", json.dumps({"quotes": [_quote(store, w) for w in (60, 61, 62)]}))
+
+    try:
+        status, payload, _ = asyncio.run(main())
+    finally:
+        svc.close()
+    assert status == 200 and [r["error"] for r in payload["results"]] == [None] * 3
+    assert svc.stats.latency.counters()["rejected"] == 1 and svc.queued == 0
+
+
+def test_bad_batch_item_only_fails_itself(svc, store):
+    quotes = [_quote(store), _quote(store, regimen="No such regimen"), "not an object", _quote(store, weight=-1)]
+    status, payload, _ = asyncio.run(svc.dispatch("POST", "/quote/batch", json.dumps({"quotes": quotes}).encode()))
+    results = payload["results"]
+    assert status == 200 and len(results) == 4
+    assert results[0]["error"] is None and results[0]["total_paid"] > 0
+    assert "No such regimen" in results[1]["error"]
+    assert results[2] == {"error": "quote must be a JSON object"}
+    assert "must be positive" in results[3]["error"]
+
+
+def _exchange(svc, raw):
+    """Send raw bytes to a live server on ``svc``; returns [(status, headers, payload)] until it closes."""
+    async def main():
+        server = await asyncio.start_server(svc.handle, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(raw)
+            await writer.drain()
+            out = []
+            while line := await reader.readline():
+                headers = {}
+                while (h := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = h.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers["content-length"]))
+                out.append((int(line.split()[1]), headers, json.loads(body)))
+            writer.close()
+            return out
+    return asyncio.run(main())
+
+
+def _request(method, path, body=b"", **headers):
+    head = [f"{method} {path} HTTP/1.1", "Host: test", f"Content-Length: {len(body)}"]
+    head += [f"{k.replace('_', '-')}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+
+def test_http_routes_and_errors(svc, store):
+    good = json.dumps(_quote(store)).encode()
+    bad = json.dumps(_quote(store, regimen="No such regimen")).encode()
+    raw = (_request("GET", "/health") + _request("POST", "/quote", good) + _request("POST", "/quote", bad)
+           + _request("POST", "/quote", b"{nope") + _request("POST", "/quote", b"[1]") + _request("GET", "/quote")
+           + _request("POST", "/nowhere") + _request("POST", "/quote/batch", b'{"quotes": 1}')
+           + _request("POST", "/quote/batch", json.dumps({"quotes": [{}] * 1001}).encode())
+           + _request("GET", "/stats", Connection="close"))
+    replies = _exchange(svc, raw)
+    assert [status for status, _, _ in replies] == [200, 200, 422, 400, 400, 405, 404, 400, 413, 200]
+    assert replies[1][2]["total_paid"] > 0 and "No such regimen" in replies[2][2]["error"]
+    assert replies[5][1]["allow"] == "POST"
+    assert replies[-1][1]["connection"] == "close" and replies[-1][2]["counters"]["requests"] == 9
+
+
+def test_http_framing_errors_close_the_connection(svc):
+    assert _exchange(svc, _request("POST", "/quote", b"", Transfer_Encoding="chunked"))[0][0] == 411
+    huge = _exchange(svc, b"POST /quote HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (MAX_BODY + 1))
+    assert huge[0][0] == 413 and huge[0][1]["connection"] == "close"
+    assert _exchange(svc, b"GARBAGE\r\n\r\n")[0][0] == 400
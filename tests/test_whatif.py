@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from oycalc import SimulationCache, memo_stats, run_simulation
+
+START = date(2026, 1, 5)
+
+
+def test_markup_reprices_without_new_tables(store):
+    spec = store.get("Private").specs.iloc[0]
+    cache = SimulationCache()
+    cache.timeline(spec, 72.5, (40, 100, 120), 1.0, START, True, "Private")
+    before = memo_stats()["misses"]
+    for k in range(1, 21):
+        cache.timeline(spec, 72.5, (40, 100, 120), 1 + 5 * k / 100, START, True, "Private")
+    assert memo_stats()["misses"] == before
+
+
+def test_date_change_reuses_columns(store):
+    spec = store.get("Private").specs.iloc[0]
+    cache = SimulationCache()
+    first = cache.timeline(spec, 72.5, (40, 100, 120), 1.2, START, True, "Private")[4]
+    moved = cache.timeline(spec, 72.5, (40, 100, 120), 1.2, START + timedelta(days=3), True, "Private")[4]
+    assert cache.stats()["columns"]["hits"] == 1
+    assert moved.cols["total_baht"] is first.cols["total_baht"]
+    assert (moved.cols["date"] - first.cols["date"]).min().astype(int) >= 3
+
+
+def test_same_totals_as_run_simulation(store):
+    cache = SimulationCache()
+    for sector in ("Government", "Private"):
+        for spec in store.get(sector).specs:
+            for multiplier in (1.0, 1.15, 1.12345):         # the last one rounds prices: solved at its own prices
+                for stock, round_down in (((40, 100, 120), False), ((100, 120), True), ((40,), False)):
+                    args = (spec, 61.3, stock, multiplier, START, True, sector, round_down)
+                    expected = run_simulation(*args)
+                    assert cache.timeline(*args)[:4] == expected[:4]
+                    assert cache.run(*args)[4].equals(expected[4])
+
+
+def test_empty_stock_is_inf_like_run_simulation(store):
+    cache = SimulationCache()
+    for spec in store.get("Government").specs:
+        for multiplier in (1.0, 1.12345):
+            args = (spec, 61.3, (), multiplier, START, True, "Government", False)
+            expected = run_simulation(*args)
+            assert cache.run(*args)[:4] == expected[:4]
+            assert cache.timeline(*args)[:4] == expected[:4]